@@ -1,113 +1,13 @@
 
 # UV API - Emma Radley.py
 
-import requests
-import sqlite3
-import time
+from store import init_database
+from store import store_uv as collect_uv
 
 def store_uv(city_names, api_key, city_coordinates, db_name='weather_data.db'):
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    
-    cur.execute('''
-                CREATE TABLE IF NOT EXISTS Cities (
-                    city_id INTEGER PRIMARY KEY,
-                    city_name TEXT UNIQUE
-                    )
-                    ''')
-    
-    cur.execute('''
-                CREATE TABLE IF NOT EXISTS UV_Data (
-                    id INTEGER PRIMARY KEY,
-                    city_id INTEGER,
-                    uv_index REAL,
-                    timestamp TEXT,
-                    FOREIGN KEY (city_id) REFERENCES Cities(city_id)
-                    )
-                    ''')
-    
-    conn.commit()
-    
-    stored_count = 0
-    max_stores = 25
-    
-    base_url = "https://api.openuv.io/api/v1/uv"
-    
-    for city in city_names:
-        if stored_count >= max_stores:
-            print(f"Reached limit of {max_stores} cities per run")
-            break
-        
-        try:
-            cur.execute('''
-                        SELECT COUNT(*) FROM UV_Data
-                        JOIN Cities ON UV_Data.city_id = Cities.city_id
-                        WHERE Cities.city_name = ? AND DATE(timestamp) = DATE('now')
-                        ''', (city,))
-            
-            if cur.fetchone()[0] > 0:
-                print(f"UV data for {city} already exists for today, skipping...")
-                continue
-            
-            if city not in city_coordinates:
-                print(f"Coordinates not found for {city}, skipping...")
-                continue
-            
-            lat, lon = city_coordinates[city]
-            
-            headers = {
-                'x-access-token': api_key
-            }
-            
-            params = {
-                'lat': lat,
-                'lng': lon
-            }
-            
-            response = requests.get(base_url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            uv_index = data['result']['uv']
-            timestamp = data['result']['uv_time']
-            
-            cur.execute('SELECT city_id FROM Cities WHERE city_name = ?', (city,))
-            result = cur.fetchone()
-            
-            if result:
-                city_id = result[0]
-            else:
-                cur.execute('SELECT MAX(city_id) FROM Cities')
-                max_id = cur.fetchone()[0]
-                city_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Cities (city_id, city_name) VALUES (?, ?)', (city_id, city))
-            
-            cur.execute('SELECT MAX(id) FROM UV_Data')
-            max_id = cur.fetchone()[0]
-            uv_id = 1 if max_id is None else max_id + 1
-            
-            cur.execute('''
-                        INSERT INTO UV_Data (id, city_id, uv_index, timestamp)
-                        VALUES (?, ?, ?, ?)
-                        ''', (uv_id, city_id, uv_index, timestamp))
-            
-            conn.commit()
-            stored_count += 1
-            print(f'Stored UV data for {city}: UV Index = {uv_index}')
-            
-            time.sleep(0.5)
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data for {city}: {e}")
-            continue
-        except KeyError as e:
-            print(f"Error parsing data for {city}: Missing key {e}")
-            continue
-    
-    conn.close()
-    print(f"\nTotal cities stored this run: {stored_count}")
-    return stored_count
+    # runs through the shared collector engine (OPENUV in providers.py)
+    init_database(db_name)
+    return collect_uv(city_names, api_key, city_coordinates, db_name)
 
 
 def calculate_avg_uv(conn, city_id=None):
@@ -207,7 +107,7 @@ if __name__ == "__main__":
     print("\n" + "="*50)
     print("Calculating average UV index for all cities...")
     print("="*50)
-    conn = sqlite3.connect('weather_data.db')
+    conn = db.connect('weather_data.db')
     avg_uv = calculate_avg_uv(conn)
     print(f"\n✓ Overall average UV index across all cities: {avg_uv:.2f}")
     print("✓ Results written to calculations_output.txt")
@@ -1,14 +1,27 @@
-import sqlite3
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+import columnar
+import db
+from metrics import build_metrics_frame, data_version, window_dates
+from scoring import compute_safety_scores, rank_by_score
+from timeseries import load_timeseries
+
 
 DB_NAME = 'weather_data.db'
 OUTPUT_FILE = 'calculations_output.txt'
+RESULT_CACHE = 'analysis_cache.json'  # data version and results of the last complete run
 
 
-def calculate_avg_temp(db_conn, city_id=None):
-    cur = db_conn.cursor()
+def calculate_avg_temp(db_conn, city_id=None, frame=None):
+    if frame is None:
+        frame = build_metrics_frame(db_conn)
     
     with open(OUTPUT_FILE, 'a') as f:
         f.write("\n" + "="*50 + "\n")
@@ -16,23 +29,14 @@ def calculate_avg_temp(db_conn, city_id=None):
         f.write("="*50 + "\n\n")
         
         if city_id is None:
-            cur.execute('''
-                SELECT Cities.city_name, AVG(Weather_Data.temperature) as avg_temp
-                FROM Weather_Data
-                JOIN Cities ON Weather_Data.city_id = Cities.city_id
-                GROUP BY Cities.city_id, Cities.city_name
-                ORDER BY avg_temp DESC
-            ''')
-            
-            results = cur.fetchall()
+            results = sorted(frame.city_averages('temperature'), key=lambda x: x[1], reverse=True)
             
             if not results:
                 print("No weather data found")
                 f.write("No weather data found\n")
                 return None
             
-            cur.execute('SELECT AVG(temperature) FROM Weather_Data')
-            overall_avg = cur.fetchone()[0]
+            overall_avg = frame.overall_average('temperature')
             
             f.write(f"Overall Average Temperature: {overall_avg:.2f}°F\n\n")
             f.write("Average Temperature by City:\n")
@@ -43,15 +47,7 @@ def calculate_avg_temp(db_conn, city_id=None):
             
             return overall_avg
         else:
-            cur.execute('''
-                SELECT Cities.city_name, AVG(Weather_Data.temperature) as avg_temp
-                FROM Weather_Data
-                JOIN Cities ON Weather_Data.city_id = Cities.city_id
-                WHERE Cities.city_id = ?
-                GROUP BY Cities.city_id, Cities.city_name
-            ''', (city_id,))
-            
-            result = cur.fetchone()
+            result = frame.city_average('temperature', city_id)
             if result:
                 city_name, avg_temp = result
                 f.write(f"City: {city_name}\n")
@@ -60,18 +56,12 @@ def calculate_avg_temp(db_conn, city_id=None):
             return None
 
 
-def calculate_avg_uv(db_conn, city_id=None):
-    cur = db_conn.cursor()
+def calculate_avg_uv(db_conn, city_id=None, frame=None):
+    if frame is None:
+        frame = build_metrics_frame(db_conn)
     
     if city_id is None:
-        cur.execute('''
-            SELECT Cities.city_name, AVG(UV_Data.uv_index) as avg_uv
-            FROM UV_Data
-            JOIN Cities ON UV_Data.city_id = Cities.city_id
-            GROUP BY Cities.city_id, Cities.city_name
-            ORDER BY avg_uv
-        ''')
-        results = cur.fetchall()
+        results = sorted(frame.city_averages('uv'), key=lambda x: x[1])
         
         with open(OUTPUT_FILE, 'a') as f:
             f.write("\n" + "="*50 + "\n")
@@ -80,21 +70,17 @@ def calculate_avg_uv(db_conn, city_id=None):
             for city_name, avg_uv in results:
                 f.write(f"{city_name}: {avg_uv:.2f}\n")
         
-        cur.execute('SELECT AVG(uv_index) FROM UV_Data')
-        overall_avg = cur.fetchone()[0]
+        overall_avg = frame.overall_average('uv')
         return overall_avg if overall_avg else 0.0
     else:
-        cur.execute('''
-            SELECT AVG(uv_index)
-            FROM UV_Data
-            WHERE city_id = ?
-        ''', (city_id,))
-        avg_uv = cur.fetchone()[0]
+        result = frame.city_average('uv', city_id)
+        avg_uv = result[1] if result else None
         return avg_uv if avg_uv else 0.0
 
 
-def calculate_avg_aqi(db_conn, city_id=None):
-    cur = db_conn.cursor()
+def calculate_avg_aqi(db_conn, city_id=None, frame=None):
+    if frame is None:
+        frame = build_metrics_frame(db_conn)
     
     with open(OUTPUT_FILE, 'a') as f:
         f.write("\n" + "="*50 + "\n")
@@ -102,22 +88,14 @@ def calculate_avg_aqi(db_conn, city_id=None):
         f.write("="*50 + "\n\n")
         
         if city_id is None:
-            cur.execute('''
-                SELECT Cities.city_name, AVG(Air_Quality_Data.aqi_value) as avg_aqi
-                FROM Air_Quality_Data
-                JOIN Cities ON Air_Quality_Data.city_id = Cities.city_id
-                GROUP BY Cities.city_id, Cities.city_name
-                ORDER BY avg_aqi
-            ''')
-            results = cur.fetchall()
+            results = sorted(frame.city_averages('aqi'), key=lambda x: x[1])
             
             if not results:
                 print('No air quality data found')
                 f.write('No air quality data found\n')
                 return None
             
-            cur.execute('SELECT AVG(aqi_value) FROM Air_Quality_Data')
-            overall_avg = cur.fetchone()[0]
+            overall_avg = frame.overall_average('aqi')
             f.write(f"Overall Average AQI: {overall_avg:.2f}\n\n")
             f.write("Average AQI by City:\n")
             f.write("-" * 40 + "\n")
@@ -127,15 +105,7 @@ def calculate_avg_aqi(db_conn, city_id=None):
             
             return overall_avg
         else:
-            cur.execute('''
-                SELECT Cities.city_name, AVG(Air_Quality_Data.aqi_value) as avg_aqi
-                FROM Air_Quality_Data
-                JOIN Cities ON Air_Quality_Data.city_id = Cities.city_id
-                WHERE Cities.city_id = ?
-                GROUP BY Cities.city_id, Cities.city_name
-            ''', (city_id,))
-            
-            result = cur.fetchone()
+            result = frame.city_average('aqi', city_id)
             if result:
                 city_name, avg_aqi = result
                 f.write(f"City: {city_name}\n")
@@ -144,61 +114,42 @@ def calculate_avg_aqi(db_conn, city_id=None):
             return None
 
 
-def calculate_safety_score(db_conn):
-    cur = db_conn.cursor()
-    
-    cur.execute('SELECT city_id, city_name FROM Cities')
-    cities = cur.fetchall()
+def get_complete_city_averages(frame):
+    '''
+    RETURNS:
+        (city_names, avg_temps, avg_uvs, avg_aqis) lists for the cities that have
+        temperature, UV and AQI readings
+    '''
+    cities = []
+    avg_temps = []
+    avg_uvs = []
+    avg_aqis = []
     
-    safety_scores = {}
+    for city_id, city_name, avg_temp, avg_uv, avg_aqi in frame.rows():
+        if avg_temp and avg_uv and avg_aqi:
+            cities.append(city_name)
+            avg_temps.append(avg_temp)
+            avg_uvs.append(avg_uv)
+            avg_aqis.append(avg_aqi)
     
-    for city_id, city_name in cities:
-        cur.execute('''
-            SELECT AVG(temperature) 
-            FROM Weather_Data 
-            WHERE city_id = ?
-        ''', (city_id,))
-        temp_result = cur.fetchone()
-        
-        cur.execute('''
-            SELECT AVG(uv_index) 
-            FROM UV_Data 
-            WHERE city_id = ?
-        ''', (city_id,))
-        uv_result = cur.fetchone()
-        
-        cur.execute('''
-            SELECT AVG(aqi_value) 
-            FROM Air_Quality_Data 
-            WHERE city_id = ?
-        ''', (city_id,))
-        aqi_result = cur.fetchone()
-        
-        if temp_result[0] and uv_result[0] and aqi_result[0]:
-            avg_temp = temp_result[0]
-            avg_uv = uv_result[0]
-            avg_aqi = aqi_result[0]
-            
-            temp_score = abs(avg_temp - 70) / 30.0
-            uv_score = avg_uv / 12.0
-            aqi_score = avg_aqi / 6.0
-            
-            composite_score = (temp_score * 0.3) + (uv_score * 0.3) + (aqi_score * 0.4)
-            
-            safety_scores[city_name] = composite_score
+    return cities, avg_temps, avg_uvs, avg_aqis
+
+
+def calculate_safety_score(db_conn, frame=None, window_days=None):
+    if frame is None:
+        frame = build_metrics_frame(db_conn, window_days)
     
-    sorted_list = []
-    for city, score in safety_scores.items():
-        sorted_list.append((city, score))
+    cities, avg_temps, avg_uvs, avg_aqis = get_complete_city_averages(frame)
     
-    for i in range(len(sorted_list)):
-        for j in range(len(sorted_list) - 1 - i):
-            if sorted_list[j][1] > sorted_list[j + 1][1]:
-                sorted_list[j], sorted_list[j + 1] = sorted_list[j + 1], sorted_list[j]
+    scores = compute_safety_scores(avg_temps, avg_uvs, avg_aqis)
+    sorted_list = [(cities[i], float(scores[i])) for i in rank_by_score(scores)]
     
     with open(OUTPUT_FILE, 'a') as f:
         f.write("\n" + "="*50 + "\n")
-        f.write("OUTDOOR ACTIVITY SAFETY SCORES\n")
+        if frame.window_days:
+            f.write(f"OUTDOOR ACTIVITY SAFETY SCORES (LAST {frame.window_days} DAYS)\n")
+        else:
+            f.write("OUTDOOR ACTIVITY SAFETY SCORES\n")
         f.write("(Lower score = safer for outdoor activities)\n")
         f.write("="*50 + "\n\n")
         f.write(f"{'Rank':<6} {'City':<25} {'Safety Score':<15}\n")
@@ -211,54 +162,41 @@ def calculate_safety_score(db_conn):
     return dict(sorted_list)
 
 
-def get_calculated_data(db_conn):
-    cur = db_conn.cursor()
-    
-    cur.execute('SELECT city_id, city_name FROM Cities')
-    cities_data = cur.fetchall()
-    
-    cities = []
-    avg_temps = []
-    avg_uvs = []
-    avg_aqis = []
-    safety_scores = []
+def load_frame(db_conn, window_days=None, backend='sqlite'):
+    '''
+    ARGUMENTS:
+        db_conn: open database connection (not used by the parquet backend)
+        window_days: only include the last window_days days of readings (None = all history)
+        backend: 'sqlite' reads the database, 'parquet' reads the columnar export
+            written by columnar.export_columnar, 'memory' loads every reading into a
+            timeseries.TimeSeriesStore and aggregates it there
+    
+    RETURNS:
+        MetricsFrame
+    '''
+    if backend == 'parquet':
+        return columnar.build_metrics_frame(columnar.EXPORT_DIR, window_days)
+    if backend == 'memory':
+        return load_timeseries(db_conn).to_frame(window_days)
+    return build_metrics_frame(db_conn, window_days)
+
+
+def get_calculated_data(db_conn, frame=None, window_days=None, backend='sqlite'):
+    if frame is None:
+        frame = load_frame(db_conn, window_days, backend)
     
-    for city_id, city_name in cities_data:
-        cur.execute('SELECT AVG(temperature) FROM Weather_Data WHERE city_id = ?', (city_id,))
-        temp_result = cur.fetchone()
-        
-        cur.execute('SELECT AVG(uv_index) FROM UV_Data WHERE city_id = ?', (city_id,))
-        uv_result = cur.fetchone()
-        
-        cur.execute('SELECT AVG(aqi_value) FROM Air_Quality_Data WHERE city_id = ?', (city_id,))
-        aqi_result = cur.fetchone()
-        
-        if temp_result[0] and uv_result[0] and aqi_result[0]:
-            avg_temp = temp_result[0]
-            avg_uv = uv_result[0]
-            avg_aqi = aqi_result[0]
-            
-            temp_score = abs(avg_temp - 70) / 30.0
-            uv_score = avg_uv / 12.0
-            aqi_score = avg_aqi / 6.0
-            composite_score = (temp_score * 0.3) + (uv_score * 0.3) + (aqi_score * 0.4)
-            
-            cities.append(city_name)
-            avg_temps.append(avg_temp)
-            avg_uvs.append(avg_uv)
-            avg_aqis.append(avg_aqi)
-            safety_scores.append(composite_score)
+    cities, avg_temps, avg_uvs, avg_aqis = get_complete_city_averages(frame)
     
     return {
         'cities': cities,
-        'safety_scores': safety_scores,
+        'safety_scores': compute_safety_scores(avg_temps, avg_uvs, avg_aqis).tolist(),
         'avg_temps': avg_temps,
         'avg_uv': avg_uvs,
         'avg_aqi': avg_aqis
     }
 
 
-def create_safety_ranking_chart(calculated_data):
+def create_safety_ranking_chart(calculated_data, dpi=300):
     city_score_pairs = []
     for i in range(len(calculated_data['cities'])):
         city_score_pairs.append((calculated_data['cities'][i], calculated_data['safety_scores'][i]))
@@ -276,12 +214,12 @@ def create_safety_ranking_chart(calculated_data):
     plt.title('Top 10 Safest Cities for Outdoor Activities', fontsize=14, fontweight='bold')
     plt.xticks(range(len(top_cities)), top_cities, rotation=45, ha='right')
     plt.tight_layout()
-    plt.savefig('safety_ranking.png', dpi=300, bbox_inches='tight')
+    plt.savefig('safety_ranking.png', dpi=dpi, bbox_inches='tight')
     plt.close()
     print("✓ Created safety_ranking.png")
 
 
-def create_grouped_comparison_chart(calculated_data):
+def create_grouped_comparison_chart(calculated_data, dpi=300):
     data_tuples = []
     for i in range(len(calculated_data['cities'])):
         data_tuples.append((
@@ -317,12 +255,12 @@ def create_grouped_comparison_chart(calculated_data):
     ax.set_xticklabels(cities, rotation=45, ha='right')
     ax.legend()
     plt.tight_layout()
-    plt.savefig('grouped_comparison.png', dpi=300, bbox_inches='tight')
+    plt.savefig('grouped_comparison.png', dpi=dpi, bbox_inches='tight')
     plt.close()
     print("✓ Created grouped_comparison.png")
 
 
-def create_scatter_plot(calculated_data):
+def create_scatter_plot(calculated_data, dpi=300):
     plt.figure(figsize=(12, 8))
     
     scatter = plt.scatter(
@@ -348,13 +286,12 @@ def create_scatter_plot(calculated_data):
     plt.title('Temperature vs Air Quality (Color = UV Index)', fontsize=14, fontweight='bold')
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('scatter_temp_aqi.png', dpi=300, bbox_inches='tight')
+    plt.savefig('scatter_temp_aqi.png', dpi=dpi, bbox_inches='tight')
     plt.close()
     print("✓ Created scatter_temp_aqi.png")
 
 
-def create_horizontal_rankings(calculated_data):
-    
+def create_temperature_ranking(calculated_data, dpi=300):
     temp_data = []
     for i in range(len(calculated_data['cities'])):
         temp_deviation = abs(calculated_data['avg_temps'][i] - 70)
@@ -373,9 +310,12 @@ def create_horizontal_rankings(calculated_data):
     plt.axvline(x=70, color='green', linestyle='--', alpha=0.5, label='Ideal (70°F)')
     plt.legend()
     plt.tight_layout()
-    plt.savefig('ranking_temperature.png', dpi=300, bbox_inches='tight')
+    plt.savefig('ranking_temperature.png', dpi=dpi, bbox_inches='tight')
     plt.close()
-    
+    print("✓ Created ranking_temperature.png")
+
+
+def create_uv_ranking(calculated_data, dpi=300):
     uv_data = []
     for i in range(len(calculated_data['cities'])):
         uv_data.append((calculated_data['cities'][i], calculated_data['avg_uv'][i]))
@@ -391,9 +331,12 @@ def create_horizontal_rankings(calculated_data):
     plt.xlabel('Average UV Index', fontsize=12, fontweight='bold')
     plt.title('Cities Ranked by Lowest UV Index', fontsize=14, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('ranking_uv.png', dpi=300, bbox_inches='tight')
+    plt.savefig('ranking_uv.png', dpi=dpi, bbox_inches='tight')
     plt.close()
-    
+    print("✓ Created ranking_uv.png")
+
+
+def create_aqi_ranking(calculated_data, dpi=300):
     aqi_data = []
     for i in range(len(calculated_data['cities'])):
         aqi_data.append((calculated_data['cities'][i], calculated_data['avg_aqi'][i]))
@@ -409,15 +352,18 @@ def create_horizontal_rankings(calculated_data):
     plt.xlabel('Average AQI', fontsize=12, fontweight='bold')
     plt.title('Cities Ranked by Best Air Quality', fontsize=14, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('ranking_aqi.png', dpi=300, bbox_inches='tight')
+    plt.savefig('ranking_aqi.png', dpi=dpi, bbox_inches='tight')
     plt.close()
-    
-    print("✓ Created ranking_temperature.png")
-    print("✓ Created ranking_uv.png")
     print("✓ Created ranking_aqi.png")
 
 
-def create_heatmap(calculated_data):
+def create_horizontal_rankings(calculated_data, dpi=300):
+    create_temperature_ranking(calculated_data, dpi)
+    create_uv_ranking(calculated_data, dpi)
+    create_aqi_ranking(calculated_data, dpi)
+
+
+def create_heatmap(calculated_data, dpi=300):
     all_data = []
     for i in range(len(calculated_data['cities'])):
         temps_norm = abs(calculated_data['avg_temps'][i] - 70) / 30
@@ -460,12 +406,40 @@ def create_heatmap(calculated_data):
                  fontsize=14, fontweight='bold', pad=20)
     
     plt.tight_layout()
-    plt.savefig('heatmap_all_metrics.png', dpi=300, bbox_inches='tight')
+    plt.savefig('heatmap_all_metrics.png', dpi=dpi, bbox_inches='tight')
     plt.close()
     print("✓ Created heatmap_all_metrics.png")
 
 
-def create_visualizations(calculated_data):
+CHARTS = {
+    'safety_ranking.png': create_safety_ranking_chart,
+    'grouped_comparison.png': create_grouped_comparison_chart,
+    'scatter_temp_aqi.png': create_scatter_plot,
+    'ranking_temperature.png': create_temperature_ranking,
+    'ranking_uv.png': create_uv_ranking,
+    'ranking_aqi.png': create_aqi_ranking,
+    'heatmap_all_metrics.png': create_heatmap,
+}
+
+
+def init_render_worker():
+    # worker processes never open a window, so always draw with the non-interactive backend
+    plt.switch_backend('Agg')
+
+
+def render_chart(chart_name, calculated_data, dpi=300):
+    '''
+    draws one chart from CHARTS and times it
+    
+    RETURNS:
+        (chart_name, seconds taken)
+    '''
+    start = time.perf_counter()
+    CHARTS[chart_name](calculated_data, dpi)
+    return chart_name, time.perf_counter() - start
+
+
+def create_visualizations(calculated_data, workers=1, dpi=300):
     print("\n" + "="*50)
     print("CREATING VISUALIZATIONS")
     print("="*50)
@@ -474,20 +448,103 @@ def create_visualizations(calculated_data):
         print("No data available for visualizations")
         return
     
-    create_safety_ranking_chart(calculated_data)
-    create_grouped_comparison_chart(calculated_data)
-    create_scatter_plot(calculated_data)
-    create_horizontal_rankings(calculated_data)
-    create_heatmap(calculated_data)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker) as executor:
+            jobs = [executor.submit(render_chart, chart_name, calculated_data, dpi) for chart_name in CHARTS]
+            render_times = [job.result() for job in jobs]
+    else:
+        render_times = [render_chart(chart_name, calculated_data, dpi) for chart_name in CHARTS]
+    
+    print("\nRender times:")
+    for chart_name, seconds in render_times:
+        print(f"  {chart_name:25s} {seconds:.2f}s")
     
     print("\n✓ All visualizations created successfully!")
 
 
-def main():
+def latest_mtime(path):
+    mtimes = [os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+    return max(mtimes, default=None)
+
+
+def result_cache_key(db_conn, window_days=None, backend='sqlite', export=False, dpi=300):
+    '''
+    everything the report and charts depend on: the data version, the options, and
+    for a window the days it covers (a window moves at midnight without any new rows)
+    
+    RETURNS:
+        JSON-compatible dict
+    '''
+    key = {
+        'data_version': data_version(db_conn),
+        'window': window_dates(window_days) if window_days else None,
+        'backend': backend,
+        'export': export,
+        'dpi': dpi,
+    }
+    if backend == 'parquet' and not export:
+        # the export can be rewritten without the database changing
+        key['export_mtime'] = latest_mtime(columnar.EXPORT_DIR)
+    return json.loads(json.dumps(key))
+
+
+def load_cached_results(key):
+    '''
+    RETURNS:
+        the last run's cache entry if it was made for key and its files are all still
+        there, otherwise None
+    '''
+    try:
+        with open(RESULT_CACHE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if cached.get('key') != key:
+        return None
+    if not all(os.path.exists(path) for path in cached.get('files', [])):
+        return None
+    return cached
+
+
+def save_cached_results(key, summary, files):
+    # written to a temporary file first, so a run that dies halfway never leaves a broken cache
+    tmp = RESULT_CACHE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'key': key, 'summary': summary, 'files': files}, f)
+    os.replace(tmp, RESULT_CACHE)
+
+
+def print_summary(avg_temp, avg_uv, avg_aqi):
+    print("\n" + "="*50)
+    print("SUMMARY RESULTS")
+    print("="*50)
+    print(f"Overall Average Temperature: {avg_temp:.2f}°F" if avg_temp else "No temperature data")
+    print(f"Overall Average UV Index: {avg_uv:.2f}" if avg_uv else "No UV data")
+    print(f"Overall Average AQI: {avg_aqi:.2f}" if avg_aqi else "No AQI data")
+
+
+def main(workers=1, dpi=300, window_days=None, backend='sqlite', export=False, refresh=False):
+    '''
+    ARGUMENTS:
+        refresh: recalculate and redraw even if the readings haven't changed since the
+            last run (otherwise that run's report and charts are kept as they are)
+    '''
     print("="*60)
     print("WEATHER DATA ANALYSIS - CALCULATIONS & VISUALIZATIONS")
     print("="*60)
     
+    conn = db.connect(DB_NAME)
+    
+    key = result_cache_key(conn, window_days, backend, export, dpi)
+    cached = None if refresh else load_cached_results(key)
+    if cached is not None:
+        conn.close()
+        print(f"\nNo new readings since the last run, keeping {OUTPUT_FILE} and the charts "
+              f"(use --refresh to recalculate)")
+        print_summary(**cached['summary'])
+        return
+    
     print("\n" + "="*50)
     print("PERFORMING CALCULATIONS")
     print("="*50)
@@ -496,37 +553,40 @@ def main():
         f.write("WEATHER DATA ANALYSIS RESULTS\n")
         f.write("="*50 + "\n")
     
-    conn = sqlite3.connect(DB_NAME)
+    if export:
+        columnar.export_columnar(DB_NAME)
+    
+    # every report and chart below reads from this one set of aggregates
+    frame = load_frame(conn, window_days, backend)
     
     print("\nCalculating average temperature...")
-    avg_temp = calculate_avg_temp(conn)
+    avg_temp = calculate_avg_temp(conn, frame=frame)
     
     print("Calculating average UV index...")
-    avg_uv = calculate_avg_uv(conn)
+    avg_uv = calculate_avg_uv(conn, frame=frame)
     
     print("Calculating average AQI...")
-    avg_aqi = calculate_avg_aqi(conn)
+    avg_aqi = calculate_avg_aqi(conn, frame=frame)
     
     print("\nCalculating safety scores...")
-    safety_scores = calculate_safety_score(conn)
+    safety_scores = calculate_safety_score(conn, frame=frame)
     
-    print("\n" + "="*50)
-    print("SUMMARY RESULTS")
-    print("="*50)
-    print(f"Overall Average Temperature: {avg_temp:.2f}°F" if avg_temp else "No temperature data")
-    print(f"Overall Average UV Index: {avg_uv:.2f}" if avg_uv else "No UV data")
-    print(f"Overall Average AQI: {avg_aqi:.2f}" if avg_aqi else "No AQI data")
+    print_summary(avg_temp, avg_uv, avg_aqi)
     
     print("\nRetrieving data for visualizations...")
-    calculated_data = get_calculated_data(conn)
+    calculated_data = get_calculated_data(conn, frame=frame)
     
+    files = [OUTPUT_FILE]
     if calculated_data['cities']:
-        create_visualizations(calculated_data)
+        create_visualizations(calculated_data, workers, dpi)
+        files.extend(CHARTS)
     else:
         print("Insufficient data for visualizations. Run data collection multiple times over 4+ days.")
     
     conn.close()
     
+    save_cached_results(key, {'avg_temp': avg_temp, 'avg_uv': avg_uv, 'avg_aqi': avg_aqi}, files)
+    
     print("\n" + "="*50)
     print("COMPLETE!")
     print("="*50)
@@ -536,4 +596,18 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Weather data calculations and charts')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to render charts')
+    parser.add_argument('--dpi', type=int, default=300, help='resolution of the saved PNGs')
+    parser.add_argument('--window-days', type=int, default=None,
+                        help='only use the last N days of readings (e.g. 1, 7 or 30)')
+    parser.add_argument('--backend', choices=['sqlite', 'parquet', 'memory'], default='sqlite',
+                        help='read aggregates from the database, the columnar export or an '
+                             'in-memory copy of every reading')
+    parser.add_argument('--export', action='store_true',
+                        help='write the columnar export (needs pyarrow) before calculating')
+    parser.add_argument('--refresh', action='store_true',
+                        help='recalculate and redraw even if no readings changed since the last run')
+    args = parser.parse_args()
+    main(workers=args.workers, dpi=args.dpi, window_days=args.window_days, backend=args.backend,
+         export=args.export, refresh=args.refresh)
@@ -0,0 +1,396 @@
+from datetime import datetime
+
+import requests
+
+import db
+import http_client
+import response_cache
+from dimensions import DIMENSIONS
+from fetch_engine import TokenBucket, fetch_city
+from metrics import has_table
+from pipeline import run_pipeline
+from providers import PROVIDERS
+
+
+RATE_LIMITERS = {
+    name: TokenBucket(provider.rate, capacity=provider.max_workers)
+    for name, provider in PROVIDERS.items()
+}
+
+
+# providers whose bulk endpoint has been refused (e.g. WeatherAPI's, which free plans don't get)
+BULK_FAILED = set()
+
+
+def endpoint_refused(error):
+    '''
+    RETURNS:
+        True if error means the endpoint isn't available to us (a 4xx other than 429),
+        rather than a timeout, connection error or 5xx that might not happen next time
+    '''
+    response = getattr(error, 'response', None)
+    return (isinstance(error, requests.HTTPError) and response is not None
+            and 400 <= response.status_code < 500 and response.status_code != 429)
+
+
+def reading_times():
+    now = datetime.now()
+    return {
+        'timestamp': int(now.timestamp()),  # UTC epoch seconds
+        'current_date': now.strftime('%Y-%m-%d')  # local date
+    }
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def create_measurement_table(cur, provider):
+    '''
+    creates provider's measurement table (id, city_id, its columns, timestamp, obs_date)
+    '''
+    columns = ''.join(f'            {column} {sql_type},\n' for column, sql_type in provider.columns)
+    references = ''
+    for column, (kind, _) in provider.lookups.items():
+        table, id_column, _ = DIMENSIONS[kind]
+        references += f',\n            FOREIGN KEY ({column}) REFERENCES {table}({id_column})'
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS {provider.table} (
+            id INTEGER PRIMARY KEY,
+            city_id INTEGER,
+{columns}            timestamp INTEGER,
+            obs_date TEXT,
+            FOREIGN KEY (city_id) REFERENCES Cities(city_id){references}
+        )
+    ''')
+
+
+class Collector:
+    '''
+    fetches, parses and stores one provider's readings, driven by its Provider definition
+
+    parsed results are cached in response_cache. Cache misses are packed into bulk
+    requests of up to bulk_limit cities (prefetch) where the provider has a bulk
+    endpoint; any city a bulk request can't cover (or every city, once the provider
+    has refused a bulk request in this process) is fetched with a plain per-city request instead
+
+    ARGUMENTS:
+        provider: Provider definition
+        api_key: provider API key
+        context: extra lookup data passed to build_params / cache_query (e.g. coordinates)
+        limiter: optional TokenBucket; one token is taken per HTTP request
+        columns: columns written after city_id (provider's columns by default, see stored_columns)
+    '''
+
+    def __init__(self, provider, api_key, context=None, limiter=None, columns=None):
+        self.provider = provider
+        self.api_key = api_key
+        self.context = context
+        self.limiter = limiter
+        self.columns = columns or [column for column, _ in provider.columns]
+        self.bulk_enabled = (provider.bulk_request is not None and provider.bulk_limit > 1
+                             and provider.name not in BULK_FAILED)
+        self.prefetched = {}
+
+    @property
+    def insert_sql(self):
+        columns = ['city_id'] + self.columns + ['timestamp', 'obs_date']
+        return f'''
+    INSERT INTO {self.provider.table} ({', '.join(columns)})
+    VALUES ({', '.join('?' for _ in columns)})
+'''
+
+    def parse(self, data):
+        return {**self.provider.extract(data), **reading_times()}
+
+    def request(self, city):
+        '''
+        RETURNS:
+            parsed data for one city (one HTTP request)
+        '''
+        auth_params, headers = self.provider.auth(self.api_key)
+        params = {**self.provider.build_params(city, self.context), **auth_params}
+
+        response = http_client.get(self.provider.url, params=params, headers=headers or None)
+        response.raise_for_status()
+        data = response.json()
+
+        if self.provider.on_response is not None:
+            self.provider.on_response(city, data)
+        return self.parse(data)
+
+    def cached(self, city):
+        '''
+        RETURNS:
+            the cached reading for city, or None if there is none from today
+        '''
+        data = response_cache.get(self.provider.name, self.provider.cache_query(city, self.context),
+                                  self.provider.ttl)
+        # a reading cached yesterday is still inside its TTL just after midnight, but
+        # write() would only skip it as a duplicate of yesterday's row
+        if data is None or data.get('current_date') != datetime.now().strftime('%Y-%m-%d'):
+            return None
+        return data
+
+    def fetch(self, city):
+        data = self.cached(city)
+        if data is None:
+            data = self.request(city)
+            response_cache.put(self.provider.name, self.provider.cache_query(city, self.context), data)
+        return data
+
+    def prefetch(self, cities, stop=None):
+        '''
+        packs the cities missing from the response cache into bulk requests of up to
+        bulk_limit cities, before the per-city fetchers start. What the bulk requests
+        return is kept for fetch_batch; the cities they can't cover are left to plain
+        per-city requests, which the pipeline spreads over its fetcher threads
+
+        ARGUMENTS:
+            cities: list of city names
+            stop: optional threading.Event; no new requests are made once it is set
+        '''
+        if not self.bulk_enabled:
+            return
+
+        name = self.provider.name
+        misses = [city for city in cities if self.cached(city) is None]
+        for group in chunks(self.provider.bulk_filter(misses), self.provider.bulk_limit):
+            # a bulk request for one city costs the same as a plain one
+            if len(group) < 2 or not self.wait(stop):
+                continue
+            try:
+                found = self.provider.bulk_request(self.api_key, group)
+            except Exception as e:
+                if not endpoint_refused(e):
+                    # most likely transient, so only this group goes back to per-city requests
+                    print(f"Bulk {name} request failed ({e}), fetching its {len(group)} cities one by one")
+                    continue
+                print(f"Bulk {name} request refused ({e}), falling back to per-city requests")
+                # remembered for the whole process, so later runs don't pay for another refused request
+                BULK_FAILED.add(name)
+                self.bulk_enabled = False
+                return
+
+            for city, response_data in found.items():
+                try:
+                    data = self.parse(response_data)
+                except KeyError:
+                    # left for the per-city request, which reports the error
+                    continue
+                response_cache.put(name, self.provider.cache_query(city, self.context), data)
+                self.prefetched[city] = data
+
+    def fetch_batch(self, cities, stop=None):
+        '''
+        ARGUMENTS:
+            cities: list of city names
+            stop: optional threading.Event; no new requests are made once it is set
+
+        RETURNS:
+            list of (city, data, error) in the order of cities, leaving out the cities
+            skipped because stop was set
+        '''
+        results = []
+        for city in cities:
+            data = self.prefetched.pop(city, None) or self.cached(city)
+            if data is not None:
+                results.append((city, data, None))
+                continue
+            if not self.wait(stop):
+                break
+            results.append(fetch_city(city, self.fetch))
+        return results
+
+    def wait(self, stop=None):
+        '''
+        waits for a rate limit token
+
+        RETURNS:
+            False if stop was set (before or while waiting), so no request should be made
+        '''
+        if stop is not None and stop.is_set():
+            return False
+        if self.limiter is not None:
+            self.limiter.acquire()
+        return stop is None or not stop.is_set()
+
+    def write(self, cur, dimensions, city, data, pending_keys):
+        '''
+        turns one parsed reading into a row for insert_sql (runs inside the writer's flush transaction)
+
+        RETURNS:
+            (row tuple, "Stored ..." message), or None if the city already has a reading for that day
+        '''
+        provider = self.provider
+        current_date = data['current_date']
+
+        city_id = dimensions.city_id(cur, city)
+        values = []
+        for column in self.columns:
+            if column in provider.lookups:
+                kind, field = provider.lookups[column]
+                values.append(dimensions.lookup(cur, kind, data[field]))
+            else:
+                values.append(data[column])
+
+        # Check if data for this city on this date already exists
+        cur.execute(f'''
+            SELECT 1 FROM {provider.table}
+            WHERE city_id = ? AND obs_date = ?
+            LIMIT 1
+        ''', (city_id, current_date))
+
+        if cur.fetchone() is not None or (city_id, current_date) in pending_keys:
+            print(f'{capitalize(provider.label)} data for {city} on {current_date} already exists, skipping...')
+            return None
+
+        timestamp = data['timestamp']
+        if isinstance(timestamp, str):
+            # parsed responses cached before timestamps became epoch seconds
+            timestamp = int(datetime.fromisoformat(timestamp).timestamp())
+
+        pending_keys.add((city_id, current_date))
+        message = f'Stored {provider.label} data for {city}: {provider.message.format(**data)}'
+        return (city_id, *values, timestamp, current_date), message
+
+
+def capitalize(label):
+    # 'UV' has to stay 'UV', so str.capitalize() won't do
+    return label[:1].upper() + label[1:]
+
+
+def stored_columns(db_name, provider):
+    '''
+    matches provider's columns to its measurement table. Tables ella.py created keep
+    the condition text (weather_condition) where the current schema has condition_id;
+    readings for those are stored the same way, as text. A table missing a column in
+    any other way raises ValueError before anything is fetched
+
+    RETURNS:
+        list of the columns to write after city_id
+    '''
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        cur.execute(f'PRAGMA table_info({provider.table})')
+        existing = {row[1] for row in cur.fetchall()}
+
+    columns = []
+    for column, _ in provider.columns:
+        if column not in existing and column in provider.lookups and provider.lookups[column][1] in existing:
+            column = provider.lookups[column][1]
+        elif column not in existing:
+            raise ValueError(f"{provider.table} in {db_name} has no {column} column; merge the file into "
+                             f"a current database with merge.py instead of collecting into it")
+        columns.append(column)
+    return columns
+
+
+def cities_stored_on(db_name, provider, obs_date, city_names):
+    '''
+    finds which cities already have a reading from provider for obs_date, with one query
+
+    ARGUMENTS:
+        db_name: SQLite database file
+        provider: Provider definition
+        obs_date: 'YYYY-MM-DD'
+        city_names: cities about to be fetched
+
+    RETURNS:
+        set of the city names that can be skipped
+    '''
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+
+        if has_table(conn, 'Daily_Rollups'):
+            # (metric, obs_date, city_id) is the rollup key, so this is an index range scan
+            cur.execute('''
+                SELECT Cities.city_name
+                FROM Daily_Rollups
+                JOIN Cities ON Daily_Rollups.city_id = Cities.city_id
+                WHERE Daily_Rollups.metric = ? AND Daily_Rollups.obs_date = ?
+            ''', (provider.metric, obs_date))
+        else:
+            table = provider.table
+            cur.execute(f'''
+                SELECT DISTINCT Cities.city_name
+                FROM {table}
+                JOIN Cities ON {table}.city_id = Cities.city_id
+                WHERE {table}.obs_date = ?
+            ''', (obs_date,))
+
+        stored = {row[0] for row in cur.fetchall()}
+    return stored & set(city_names)
+
+
+def plan_fetch(city_names, db_name, provider):
+    '''
+    drops the cities that already have today's reading before any request is made
+
+    RETURNS:
+        list of the cities that still need fetching, in their original order
+    '''
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    stored = cities_stored_on(db_name, provider, current_date, city_names)
+
+    for city in city_names:
+        if city in stored:
+            print(f'{capitalize(provider.label)} data for {city} on {current_date} already exists, skipping...')
+
+    return [city for city in city_names if city not in stored]
+
+
+def stored_total(db_name, provider):
+    '''
+    RETURNS:
+        number of provider's rows in the database, added up from the per-city counts the
+        City_Metric_Summary triggers keep, so there is no COUNT(*) over the measurement table
+    '''
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT COALESCE(SUM(count), 0) FROM City_Metric_Summary WHERE metric = ?',
+                    (provider.metric,))
+        return cur.fetchone()[0]
+
+
+def collect(provider, city_names, api_key, db_name, context=None, batch_size=None, max_stores=25):
+    '''
+    collects one provider's readings for city_names into its measurement table
+
+    ARGUMENTS:
+        provider: Provider definition or key of PROVIDERS
+        city_names: list of city names
+        api_key: provider API key
+        db_name: SQLite database file (already set up by store.init_database)
+        context: extra lookup data for the provider ({city: (lat, lng)} for the ones that
+            need coordinates, like OpenUV)
+        batch_size: most rows per transaction (None = flush on pipeline.FLUSH_INTERVAL only)
+        max_stores: most rows stored per run (None = no limit)
+
+    RETURNS:
+        number of rows stored
+    '''
+    if isinstance(provider, str):
+        provider = PROVIDERS[provider]
+
+    if provider.needs_coordinates:
+        # cities without coordinates never make a request, so they don't use up rate limit tokens
+        for city in city_names:
+            if city not in (context or {}):
+                print(f"Coordinates not found for {city}, skipping...")
+        city_names = [city for city in city_names if city in (context or {})]
+
+    columns = stored_columns(db_name, provider)
+    city_names = plan_fetch(city_names, db_name, provider)
+
+    collector = Collector(provider, api_key, context, RATE_LIMITERS[provider.name], columns)
+    collector.prefetch(city_names)
+    stored_count = run_pipeline(city_names, collector.fetch_batch, collector.write, collector.insert_sql,
+                                db_name, provider.max_workers, max_stores=max_stores, batch_size=batch_size)
+
+    print(f"\nTotal {provider.label} records stored this run: {stored_count}")
+
+    print(f"Total {provider.label} records in database: {stored_total(db_name, provider)}")
+
+    return stored_count
@@ -0,0 +1,187 @@
+import os
+from itertools import chain
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:
+    pa = None
+
+import db
+from metrics import METRICS, MetricsFrame, epoch_expression, window_dates
+
+
+EXPORT_DIR = 'columnar'
+EXPORT_BATCH = 100000  # rows read from SQLite per record batch
+
+if pa is not None:
+    READING_SCHEMA = pa.schema([
+        ('city_id', pa.int64()),
+        ('value', pa.float64()),
+        ('timestamp', pa.int64()),  # UTC epoch seconds
+        ('metric', pa.string()),
+        ('obs_date', pa.string()),
+    ])
+    # one directory per metric, then one per day: columnar/readings/metric=uv/obs_date=2025-12-06/
+    PARTITIONING = ds.partitioning(pa.schema([('metric', pa.string()), ('obs_date', pa.string())]),
+                                   flavor='hive')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("the columnar export needs pyarrow (pip install pyarrow)")
+
+
+def reading_batches(conn, metric, since=None):
+    '''
+    reads one metric's readings EXPORT_BATCH rows at a time
+
+    ARGUMENTS:
+        conn: open database connection
+        metric: key of METRICS
+        since: optional 'YYYY-MM-DD'; only days from this one on are read
+
+    RETURNS:
+        generator of pyarrow.RecordBatch with READING_SCHEMA
+    '''
+    table, column = METRICS[metric]
+    cur = conn.cursor()
+
+    # databases from before obs_date existed only have the timestamp to go on
+    cur.execute(f'PRAGMA table_info({table})')
+    day = 'obs_date' if 'obs_date' in [row[1] for row in cur.fetchall()] else 'DATE(timestamp)'
+
+    sql = f'SELECT city_id, {column}, {epoch_expression(conn, table)}, {day} AS day FROM {table}'
+    params = []
+    if since:
+        sql += f' WHERE {day} >= ?'
+        params.append(since)
+    cur.execute(sql, params)
+
+    while True:
+        rows = cur.fetchmany(EXPORT_BATCH)
+        if not rows:
+            break
+        city_ids, values, timestamps, days = zip(*rows)
+        yield pa.RecordBatch.from_arrays([
+            pa.array(city_ids, pa.int64()),
+            pa.array(values, pa.float64()),
+            pa.array(timestamps, pa.int64()),
+            pa.array([metric] * len(rows), pa.string()),
+            pa.array(days, pa.string()),
+        ], schema=READING_SCHEMA)
+
+
+def export_columnar(db_name, out_dir=EXPORT_DIR, since=None):
+    '''
+    writes Weather_Data, UV_Data and Air_Quality_Data to Parquet files partitioned
+    by metric and obs_date (out_dir/readings/metric=.../obs_date=.../), plus the
+    Cities table (out_dir/cities/)
+
+    partitions that get new data are replaced, the rest are left alone, so a daily
+    export with since set to today only rewrites today's files
+
+    ARGUMENTS:
+        db_name: SQLite database file
+        out_dir: export directory
+        since: optional 'YYYY-MM-DD'; only re-export days from this one on
+
+    RETURNS:
+        number of readings written
+    '''
+    require_pyarrow()
+    written = 0
+
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT city_id, city_name FROM Cities ORDER BY city_id')
+        cities = cur.fetchall()
+        os.makedirs(out_dir, exist_ok=True)
+        city_table = pa.table({
+            'city_id': pa.array([row[0] for row in cities], pa.int64()),
+            'city_name': pa.array([row[1] for row in cities], pa.string()),
+        })
+        ds.write_dataset(city_table, os.path.join(out_dir, 'cities'), format='parquet',
+                         existing_data_behavior='delete_matching')
+
+        for metric in METRICS:
+            batches = reading_batches(conn, metric, since)
+            first = next(batches, None)
+            if first is None:
+                continue
+            written += first.num_rows
+
+            def counted(batches):
+                nonlocal written
+                for batch in batches:
+                    written += batch.num_rows
+                    yield batch
+
+            # batches stream straight from the cursor to the files, one EXPORT_BATCH at a time
+            source = pa.RecordBatchReader.from_batches(READING_SCHEMA, chain([first], counted(batches)))
+            ds.write_dataset(source, os.path.join(out_dir, 'readings'), format='parquet',
+                             partitioning=PARTITIONING, existing_data_behavior='delete_matching')
+
+    print(f"Exported {written} readings to {out_dir}")
+    return written
+
+
+def open_dataset(path, partitioning=None):
+    # memory-mapped reads let the OS page the files in instead of copying them through Python
+    return ds.dataset(path, format='parquet', partitioning=partitioning,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def build_metrics_frame(data_dir=EXPORT_DIR, window_days=None, end_date=None):
+    '''
+    columnar counterpart of metrics.build_metrics_frame: reads the export written by
+    export_columnar and computes each metric's per-city count and total with Arrow
+    group-bys, so scanning years of readings never iterates rows in Python
+
+    ARGUMENTS:
+        data_dir: export directory
+        window_days: only include the last window_days days of readings (None = all history)
+        end_date: last day of the window as 'YYYY-MM-DD' (today by default)
+
+    RETURNS:
+        MetricsFrame
+    '''
+    require_pyarrow()
+    window = window_dates(window_days, end_date) if window_days else None
+
+    cities = open_dataset(os.path.join(data_dir, 'cities')).to_table().sort_by('city_id')
+    city_ids = cities.column('city_id').to_pylist()
+    city_names = cities.column('city_name').to_pylist()
+    position = {city_id: i for i, city_id in enumerate(city_ids)}
+
+    readings_dir = os.path.join(data_dir, 'readings')
+    readings = open_dataset(readings_dir, PARTITIONING) if os.path.isdir(readings_dir) else None
+
+    stats = {}
+    for metric in METRICS:
+        counts = [0] * len(city_ids)
+        totals = [0.0] * len(city_ids)
+
+        if readings is not None:
+            condition = ds.field('metric') == metric
+            if window is not None:
+                condition = condition & (ds.field('obs_date') >= window[0]) & (ds.field('obs_date') <= window[1])
+
+            grouped = (readings.to_table(columns=['city_id', 'value'], filter=condition)
+                       .group_by('city_id')
+                       .aggregate([('value', 'count'), ('value', 'sum')]))
+            for city_id, count, total in zip(grouped.column('city_id').to_pylist(),
+                                             grouped.column('value_count').to_pylist(),
+                                             grouped.column('value_sum').to_pylist()):
+                if city_id in position:
+                    counts[position[city_id]] = count
+                    totals[position[city_id]] = total or 0.0
+
+        stats[metric] = {
+            'count': counts,
+            'total': totals,
+            'avg': [total / count if count else None for count, total in zip(counts, totals)],
+        }
+
+    return MetricsFrame(city_ids, city_names, stats, window_days)
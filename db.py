@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+# PRAGMAs applied to every connection. WAL lets calc_visual read while a collector
+# is writing, and with WAL synchronous=NORMAL only fsyncs at checkpoints instead
+# of on every commit (a power cut can lose the last commits, never corrupt the file)
+PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative = KiB, so 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+BUSY_TIMEOUT = 30  # seconds a connection waits for another one's write lock
+
+POOL_SIZE = 4  # idle connections kept open per database
+
+
+def configure(**settings):
+    '''
+    changes the profile used by connections opened after this call
+
+    ARGUMENTS:
+        settings: PRAGMA name = value, e.g. configure(synchronous='FULL');
+            a value of None drops the PRAGMA so SQLite's default applies
+    '''
+    for pragma, value in settings.items():
+        if value is None:
+            PROFILE.pop(pragma, None)
+        else:
+            PROFILE[pragma] = value
+
+
+def apply_profile(conn, profile=None):
+    cur = conn.cursor()
+    for pragma, value in (PROFILE if profile is None else profile).items():
+        cur.execute(f'PRAGMA {pragma} = {value}')
+        # journal_mode and mmap_size report back their value; fetch it so the statement finishes
+        cur.fetchall()
+
+
+def connect(db_name, timeout=BUSY_TIMEOUT, profile=None, **kwargs):
+    '''
+    opens an SQLite connection with the performance profile applied
+
+    ARGUMENTS:
+        db_name: SQLite database file
+        timeout: seconds to wait for a lock held by another connection
+        profile: PRAGMAs to use instead of PROFILE
+        kwargs: passed on to sqlite3.connect (e.g. check_same_thread)
+
+    RETURNS:
+        sqlite3.Connection
+    '''
+    conn = sqlite3.connect(db_name, timeout=timeout, **kwargs)
+    apply_profile(conn, profile)
+    return conn
+
+
+class ConnectionPool:
+    '''
+    keeps open connections to one database so the collectors, init_database and
+    the scheduler reuse them instead of opening a new one for every step
+
+    a connection is only ever used by one thread at a time (the one that took it
+    from the pool), so each collector's writer still has its own transaction
+
+    ARGUMENTS:
+        db_name: SQLite database file
+        size: most idle connections kept open
+    '''
+
+    def __init__(self, db_name, size=POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            # handed from thread to thread by the pool, never shared at the same time
+            conn = connect(self.db_name, check_same_thread=False)
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self.lock:
+                if len(self.idle) < self.size:
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name):
+    '''
+    returns the process-wide ConnectionPool for a database file
+    '''
+    key = os.path.abspath(db_name)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(key)
+        return _pools[key]
+
+
+def connection(db_name):
+    '''
+    borrows a connection from the database's pool; use as
+    "with db.connection(db_name) as conn:". Anything left uncommitted
+    is rolled back when the block ends
+
+    RETURNS:
+        context manager giving an open sqlite3.Connection
+    '''
+    return get_pool(db_name).connection()
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
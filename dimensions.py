@@ -0,0 +1,142 @@
+import os
+import threading
+
+
+# each dimension's table, id column and name column
+DIMENSIONS = {
+    'city': ('Cities', 'city_id', 'city_name'),
+    'condition': ('Weather_Conditions', 'condition_id', 'condition_name'),
+}
+
+# query that loads each dimension's name -> id map
+DIMENSION_QUERIES = {
+    kind: f'SELECT {name_column}, {id_column} FROM {table}'
+    for kind, (table, id_column, name_column) in DIMENSIONS.items()
+}
+
+
+def get_dimension_id(cur, kind, name):
+    '''
+    returns the id for name in one dimension table, inserting the name first if it is new
+
+    ARGUMENTS:
+        cur: database cursor
+        kind: key of DIMENSIONS
+        name: e.g. a city name or a weather condition from OpenWeatherMap ("Clouds")
+
+    RETURNS:
+        id assigned by SQLite
+    '''
+    table, id_column, name_column = DIMENSIONS[kind]
+    # the no-op DO UPDATE makes RETURNING give back the existing row's id on a conflict
+    cur.execute(f'''
+        INSERT INTO {table} ({name_column}) VALUES (?)
+        ON CONFLICT ({name_column}) DO UPDATE SET {name_column} = excluded.{name_column}
+        RETURNING {id_column}
+    ''', (name,))
+    return cur.fetchone()[0]
+
+
+class DimensionCache:
+    '''
+    in-memory name -> id lookup for the dimension tables (see DIMENSIONS), shared
+    by every writer on one database
+
+    each table is read once, the first time it is needed. Only committed ids are
+    added after that: a writer keeps the ids it inserts in its own WriterDimensions
+    until its transaction commits, so no writer can pick up an id that is rolled back
+    '''
+
+    def __init__(self):
+        self.ids = {kind: None for kind in DIMENSION_QUERIES}
+        self.lock = threading.Lock()
+
+    def lookup(self, cur, kind, name):
+        '''
+        RETURNS:
+            the committed id for name, or None if it isn't known yet
+        '''
+        with self.lock:
+            if self.ids[kind] is None:
+                cur.execute(DIMENSION_QUERIES[kind])
+                self.ids[kind] = dict(cur.fetchall())
+            return self.ids[kind].get(name)
+
+    def publish(self, kind, ids):
+        '''
+        adds ids ({name: id}) whose rows have been committed
+        '''
+        with self.lock:
+            if self.ids[kind] is not None:
+                self.ids[kind].update(ids)
+
+
+class WriterDimensions:
+    '''
+    one writer's view of a shared DimensionCache. Ids of the names this writer
+    inserts stay here until its transaction commits (publish) or rolls back (discard)
+
+    ARGUMENTS:
+        cache: DimensionCache of the database the writer writes to
+    '''
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.pending = {kind: {} for kind in DIMENSION_QUERIES}
+
+    def lookup(self, cur, kind, name):
+        '''
+        RETURNS:
+            the id for name in the dimension kind (a key of DIMENSIONS), inserting it if it is new
+        '''
+        id_ = self.pending[kind].get(name)
+        if id_ is None:
+            id_ = self.cache.lookup(cur, kind, name)
+
+        # the insert happens outside the cache's lock so a writer waiting on the database
+        # never blocks the others; the upsert returns the same id if two writers race
+        if id_ is None:
+            id_ = get_dimension_id(cur, kind, name)
+            self.pending[kind][name] = id_
+        return id_
+
+    def city_id(self, cur, city_name):
+        return self.lookup(cur, 'city', city_name)
+
+    def publish(self):
+        for kind, ids in self.pending.items():
+            self.cache.publish(kind, ids)
+            ids.clear()
+
+    def discard(self):
+        for ids in self.pending.values():
+            ids.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_dimension_cache(db_name):
+    '''
+    returns the process-wide DimensionCache for a database file
+
+    ARGUMENTS:
+        db_name: path to the SQLite database
+
+    RETURNS:
+        DimensionCache shared by every collector writing to that database
+    '''
+    key = os.path.abspath(db_name)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = DimensionCache()
+        return _caches[key]
+
+
+def reset_dimension_caches():
+    '''
+    forgets every cached id (use after a database file is replaced or rebuilt)
+    '''
+    with _caches_lock:
+        _caches.clear()
@@ -1,12 +1,14 @@
-import requests
-import sqlite3
-import time
+from store import init_database
+from store import store_weather as collect_weather
 
 def store_weather(city_names, api_key, db_name='weather_data.db'):
     """
     Fetches weather data from OpenWeatherMap API and stores it in database.
     Limits storage to 25 cities per run to comply with project requirements.
     
+    Collection runs through the shared collector engine (see collector.py and the
+    OPENWEATHER definition in providers.py).
+    
     Args:
         city_names: List of city names (strings)
         api_key: OpenWeatherMap API key (string)
@@ -15,123 +17,8 @@ def store_weather(city_names, api_key, db_name='weather_data.db'):
     Returns:
         Integer count of cities successfully stored
     """
-    
-    # Connect to database
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    
-    # Create tables if they don't exist
-    # Cities table - shared across all data types
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS Cities (
-            city_id INTEGER PRIMARY KEY,
-            city_name TEXT UNIQUE
-        )
-    ''')
-    
-    # Weather Data table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS Weather_Data (
-            id INTEGER PRIMARY KEY,
-            city_id INTEGER,
-            temperature REAL,
-            weather_condition TEXT,
-            timestamp TEXT,
-            FOREIGN KEY (city_id) REFERENCES Cities(city_id)
-        )
-    ''')
-    
-    conn.commit()
-    
-    # Counter for successfully stored cities
-    store_count = 0
-    max_stores = 25
-    
-    # Base URL for OpenWeatherMap API
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    
-    for city in city_names:
-        if store_count >= max_stores:
-            print(f"Reached limit of {max_stores} cities per run")
-            break
-        
-        try:
-            # Check if this city already has weather data for today
-            cur.execute('''
-                SELECT COUNT(*) FROM Weather_Data
-                JOIN Cities ON Weather_Data.city_id = Cities.city_id
-                WHERE Cities.city_name = ? AND DATE(timestamp) = DATE('now')
-            ''', (city,))
-            
-            if cur.fetchone()[0] > 0:
-                print(f"Weather data for {city} already exists for today, skipping...")
-                continue
-            
-            # Make API request
-            params = {
-                'q': city,
-                'appid': api_key,
-                'units': 'imperial'  # Get temperature in Fahrenheit
-            }
-            
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract weather data
-            temperature = data['main']['temp']
-            weather_condition = data['weather'][0]['main']
-            
-            # Create timestamp in format: YYYY-MM-DD HH:MM:SS
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Get or create city_id
-            cur.execute('SELECT city_id FROM Cities WHERE city_name = ?', (city,))
-            result = cur.fetchone()
-            
-            if result:
-                city_id = result[0]
-            else:
-                # Get next city_id by finding max + 1
-                cur.execute('SELECT MAX(city_id) FROM Cities')
-                max_id = cur.fetchone()[0]
-                city_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Cities (city_id, city_name) VALUES (?, ?)', 
-                           (city_id, city))
-            
-            # Get next id for Weather_Data
-            cur.execute('SELECT MAX(id) FROM Weather_Data')
-            max_id = cur.fetchone()[0]
-            weather_id = 1 if max_id is None else max_id + 1
-            
-            # Insert weather data
-            cur.execute('''
-                INSERT INTO Weather_Data (id, city_id, temperature, weather_condition, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (weather_id, city_id, temperature, weather_condition, timestamp))
-            
-            conn.commit()
-            store_count += 1
-            print(f'Stored weather data for {city}: Temp = {temperature}°F, Condition = {weather_condition}')
-            
-            # Small delay to avoid hitting API rate limits
-            time.sleep(0.5)
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data for {city}: {e}")
-            continue
-        except KeyError as e:
-            print(f"Error parsing data for {city}: Missing key {e}")
-            continue
-        except Exception as e:
-            print(f"Unexpected error for {city}: {e}")
-            continue
-    
-    conn.close()
-    print(f"\nTotal cities stored this run: {store_count}")
-    return store_count
+    init_database(db_name)
+    return collect_weather(city_names, api_key, db_name)
 
 
 def calculate_avg_temp(conn, city_id=None):
@@ -266,7 +153,7 @@ if __name__ == "__main__":
     
     # After running storage multiple times to get 100+ entries,
     # you can run the calculation function:
-    # conn = sqlite3.connect('weather_data.db')
+    # conn = db.connect('weather_data.db')
     # overall_avg = calculate_avg_temp(conn, city_id=None)
     # if overall_avg:
     #     comfort = get_temp_comfort_level(overall_avg)
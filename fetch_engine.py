@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TokenBucket:
+    '''
+    thread-safe token bucket used to rate limit calls to a single API provider
+
+    ARGUMENTS:
+        rate: tokens added per second
+        capacity: most tokens the bucket can hold (the allowed burst size)
+    '''
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        blocks until a token is available, then takes it
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def fetch_city(city, fetch_fn):
+    '''
+    fetches one city (the caller waits for its rate limit token first)
+
+    RETURNS:
+        (city, data, error) where error is the exception raised (or None)
+    '''
+    try:
+        return city, fetch_fn(city), None
+    except Exception as e:
+        return city, None, e
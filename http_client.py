@@ -0,0 +1,144 @@
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+POOL_SIZE = 10
+TIMEOUT = (5, 15)  # (connect, read) seconds
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_sent = Counter()  # requests sent per base URL, retries included
+_sent_lock = threading.Lock()
+
+
+def count_request(base_url):
+    with _sent_lock:
+        _sent[base_url] += 1
+
+
+def requests_sent(base_urls):
+    '''
+    RETURNS:
+        number of requests sent to base_urls by this process so far, counting every retry
+    '''
+    with _sent_lock:
+        return sum(_sent[base_url] for base_url in base_urls)
+
+
+class CountingRetry(Retry):
+    '''
+    urllib3 retry policy that counts every retry it allows as one more request to base_url
+    '''
+
+    def __init__(self, *args, base_url=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.base_url = self.base_url
+        return retry
+
+    def increment(self, *args, **kwargs):
+        # raises instead of returning once the retries are used up, so nothing is counted then
+        retry = super().increment(*args, **kwargs)
+        count_request(self.base_url)
+        return retry
+
+
+def configure(pool_size=None, timeout=None, max_retries=None, backoff_factor=None):
+    '''
+    changes the pool / timeout / retry settings and drops any open sessions
+    so the next request picks up the new settings
+
+    ARGUMENTS:
+        pool_size: keep-alive connections kept open per base URL
+        timeout: seconds, or a (connect, read) tuple
+        max_retries: retries on connection errors and 429/5xx responses
+        backoff_factor: sleep between retries is backoff_factor * 2 ** (retry - 1)
+    '''
+    global POOL_SIZE, TIMEOUT, MAX_RETRIES, BACKOFF_FACTOR
+
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if timeout is not None:
+        TIMEOUT = timeout
+    if max_retries is not None:
+        MAX_RETRIES = max_retries
+    if backoff_factor is not None:
+        BACKOFF_FACTOR = backoff_factor
+
+    close_sessions()
+
+
+def get_session(base_url):
+    '''
+    returns the shared session for base_url, creating it on first use
+
+    ARGUMENTS:
+        base_url: provider endpoint (e.g. OPENWEATHER_BASE_URL)
+
+    RETURNS:
+        requests.Session with a keep-alive connection pool and retry policy
+    '''
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            retry = CountingRetry(
+                base_url=base_url,
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                # the only POSTs sent are read-only bulk lookups, so they are safe to retry
+                allowed_methods=['GET', 'POST'],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[base_url] = session
+        return session
+
+
+def get(base_url, params=None, headers=None, timeout=None):
+    '''
+    GET request through the pooled session for base_url
+
+    RETURNS:
+        requests.Response (call raise_for_status() as with requests.get)
+    '''
+    session = get_session(base_url)
+    count_request(base_url)
+    return session.get(base_url, params=params, headers=headers,
+                       timeout=TIMEOUT if timeout is None else timeout)
+
+
+def post(base_url, params=None, json=None, headers=None, timeout=None):
+    '''
+    POST request with a JSON body through the pooled session for base_url
+
+    RETURNS:
+        requests.Response (call raise_for_status() as with requests.post)
+    '''
+    session = get_session(base_url)
+    count_request(base_url)
+    return session.post(base_url, params=params, json=json, headers=headers,
+                        timeout=TIMEOUT if timeout is None else timeout)
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
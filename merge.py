@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+
+import db
+from dimensions import DIMENSIONS
+from metrics import EPOCH_SQL
+from providers import PROVIDERS
+from store import DB_NAME, create_rollup_table, create_summary_table, fill_rollup_table, fill_summary_table, init_database
+
+
+MERGE_BATCH = 100000  # source rows per transaction
+
+
+def legacy_columns(cur, table):
+    '''
+    RETURNS:
+        {column: declared type} of a table in the attached legacy database ({} if it has no such table)
+    '''
+    cur.execute(f'PRAGMA legacy.table_info({table})')
+    return {row[1]: row[2].upper() for row in cur.fetchall()}
+
+
+def merge_dimension_names(cur, provider, columns):
+    '''
+    adds the legacy database's dimension names (e.g. weather conditions) that the
+    target doesn't have yet, whether the legacy table keeps them as text or as ids
+
+    RETURNS:
+        {column: SQL expression giving the target's id for each legacy row (alias s)}
+    '''
+    expressions = {}
+    for column, (kind, field) in provider.lookups.items():
+        dimension, id_column, name_column = DIMENSIONS[kind]
+        if field in columns:
+            # ella.py's schema stores the condition text on every row
+            source = f'SELECT DISTINCT {field} FROM legacy.{provider.table} WHERE {field} IS NOT NULL'
+            expressions[column] = (f'(SELECT {id_column} FROM main.{dimension} '
+                                   f'WHERE {name_column} = s.{field})')
+        elif column in columns and legacy_columns(cur, dimension):
+            # ids differ between databases, so they're matched up by name
+            source = f'SELECT {name_column} FROM legacy.{dimension} WHERE {name_column} IS NOT NULL'
+            expressions[column] = (f'(SELECT d.{id_column} FROM main.{dimension} d '
+                                   f'JOIN legacy.{dimension} l ON l.{name_column} = d.{name_column} '
+                                   f'WHERE l.{id_column} = s.{column})')
+        else:
+            expressions[column] = 'NULL'
+            continue
+        cur.execute(f'INSERT INTO main.{dimension} ({name_column}) {source} ON CONFLICT DO NOTHING')
+    return expressions
+
+
+def merge_table(conn, provider, batch_size=MERGE_BATCH):
+    '''
+    copies one legacy measurement table into the target's, batch_size source rows
+    per transaction. City and dimension ids are matched up by name, timestamps become
+    UTC epoch seconds, and a row is skipped if the target already has a reading for
+    that city at that second (or one appears earlier in the same legacy table)
+
+    ARGUMENTS:
+        conn: connection to the target with the legacy database attached as legacy
+        provider: Provider definition of the table
+        batch_size: source rows per transaction
+
+    RETURNS:
+        (rows read, rows merged)
+    '''
+    cur = conn.cursor()
+    table = provider.table
+    columns = legacy_columns(cur, table)
+    if not columns:
+        return 0, 0
+
+    lookups = merge_dimension_names(cur, provider, columns)
+    conn.commit()
+
+    values = [lookups[column] if column in lookups else (f's.{column}' if column in columns else 'NULL')
+              for column, _ in provider.columns]
+    # legacy timestamps are text: naive ones are local time, ones ending in Z are UTC
+    epoch = 's.timestamp' if columns.get('timestamp') == 'INTEGER' else EPOCH_SQL.format(column='s.timestamp')
+    day = f"DATE({epoch}, 'unixepoch', 'localtime')"
+    if 'obs_date' in columns:
+        day = f'COALESCE(s.obs_date, {day})'
+
+    value_names = [column for column, _ in provider.columns]
+    insert_columns = ['city_id'] + value_names + ['timestamp', 'obs_date']
+    # GROUP BY drops duplicates within a batch (MIN picks the first row's values), NOT EXISTS
+    # the ones already in the target, including rows merged by earlier batches
+    sql = f'''
+        INSERT INTO main.{table} ({', '.join(insert_columns)})
+        SELECT {', '.join(insert_columns)}
+        FROM (
+            SELECT c.city_id AS city_id,
+                   {', '.join(f'{value} AS {name}' for value, name in zip(values, value_names))},
+                   {epoch} AS timestamp, {day} AS obs_date, MIN(s.rowid)
+            FROM legacy.{table} s
+            JOIN legacy.Cities lc ON lc.city_id = s.city_id
+            JOIN main.Cities c ON c.city_name = lc.city_name
+            WHERE s.rowid > ? AND s.rowid <= ?
+            GROUP BY c.city_id, {epoch}
+        ) AS r
+        WHERE r.timestamp IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM main.{table} t WHERE t.timestamp = r.timestamp AND t.city_id = r.city_id)
+    '''
+
+    cur.execute(f'SELECT COUNT(*), MIN(rowid), MAX(rowid) FROM legacy.{table}')
+    read, first, last = cur.fetchone()
+    merged = 0
+    if read:
+        # rowid ranges walk the legacy table's primary key, so each batch is one index range scan
+        for start in range(first - 1, last, batch_size):
+            cur.execute(sql, (start, start + batch_size))
+            merged += cur.rowcount
+            conn.commit()
+    return read, merged
+
+
+def merge_database(source, db_name=DB_NAME, batch_size=MERGE_BATCH):
+    '''
+    merges a legacy database (weather_data.db, debug weather_data.db, pre-session
+    weather_data.db or any other file the collectors have written over time) into
+    db_name's normalized schema
+
+    the summary and rollup triggers are dropped for the merge and the tables rebuilt
+    once at the end, which is far cheaper than updating them row by row. They are
+    rebuilt even if the merge fails or is interrupted part way, so the rows merged
+    so far are always counted; running merge.py again merges the rest (rows already
+    merged are skipped). A legacy table without city_id or timestamp is skipped
+
+    ARGUMENTS:
+        source: legacy SQLite database file (only read)
+        db_name: database to merge into (created if needed)
+        batch_size: source rows per transaction
+
+    RETURNS:
+        number of rows merged
+    '''
+    if os.path.abspath(source) == os.path.abspath(db_name):
+        raise ValueError(f"can't merge {source} into itself")
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+
+    init_database(db_name)
+    start = time.perf_counter()
+    total_read = total_merged = 0
+
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        cur.execute('ATTACH DATABASE ? AS legacy', (source,))
+        try:
+            if legacy_columns(cur, 'Cities'):
+                cur.execute('''
+                    INSERT INTO main.Cities (city_name)
+                    SELECT city_name FROM legacy.Cities WHERE city_name IS NOT NULL
+                    ON CONFLICT DO NOTHING
+                ''')
+
+                for provider in PROVIDERS.values():
+                    cur.execute(f'DROP TRIGGER IF EXISTS {provider.table.lower()}_summary')
+                    cur.execute(f'DROP TRIGGER IF EXISTS {provider.table.lower()}_daily_rollup')
+                conn.commit()
+
+                for provider in PROVIDERS.values():
+                    columns = legacy_columns(cur, provider.table)
+                    missing = [column for column in ('city_id', 'timestamp') if column not in columns]
+                    if columns and missing:
+                        print(f"{provider.table}: skipped, the legacy table has no {' or '.join(missing)} column")
+                        continue
+
+                    table_start = time.perf_counter()
+                    read, merged = merge_table(conn, provider, batch_size)
+                    elapsed = time.perf_counter() - table_start
+                    total_read += read
+                    total_merged += merged
+                    print(f"{provider.table}: merged {merged} of {read} rows, "
+                          f"skipped {read - merged} duplicate or unreadable ({elapsed:.2f}s, "
+                          f"{read / elapsed if elapsed else 0:,.0f} rows/s)")
+            else:
+                print(f"{source} has no Cities table, nothing to merge")
+        finally:
+            conn.commit()
+            cur.execute('DETACH DATABASE legacy')
+
+            # init_database only fills these tables when it creates them, so a merge that
+            # stopped with the triggers dropped would leave its rows out of them for good
+            create_summary_table(cur)
+            fill_summary_table(cur)
+            create_rollup_table(cur)
+            fill_rollup_table(cur)
+            conn.commit()
+
+    elapsed = time.perf_counter() - start
+    print(f"Merged {total_merged} of {total_read} rows from {source} into {db_name} in {elapsed:.2f}s "
+          f"({total_read / elapsed if elapsed else 0:,.0f} rows/s)")
+    return total_merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge legacy weather databases into the normalized schema')
+    parser.add_argument('sources', nargs='+', help='legacy database files, merged in the order given')
+    parser.add_argument('--into', default=DB_NAME, help=f'database to merge into (default: {DB_NAME})')
+    parser.add_argument('--batch-size', type=int, default=MERGE_BATCH, help='source rows per transaction')
+    args = parser.parse_args()
+
+    for source in args.sources:
+        merge_database(source, args.into, args.batch_size)
+    db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
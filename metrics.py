@@ -0,0 +1,245 @@
+from datetime import date, datetime, timedelta
+
+from providers import PROVIDERS
+
+
+# {metric: (measurement table, value column)}
+METRICS = {provider.metric: (provider.table, provider.value_column) for provider in PROVIDERS.values()}
+
+# text timestamps -> UTC epoch seconds; naive text is local time (what datetime.now() wrote),
+# text ending in Z or an offset is taken as given
+EPOCH_SQL = "CAST(strftime('%s', {column}, 'utc') AS INTEGER)"
+
+
+class MetricsFrame:
+    '''
+    per-city count, sum and average of every metric, read from the database
+    once and shared by the report writers and charts in calc_visual
+
+    ARGUMENTS:
+        city_ids: list of city ids (ordered by city_id)
+        city_names: list of city names, same order as city_ids
+        stats: {metric: {'count': [...], 'total': [...], 'avg': [...]}} lists
+            in city order, with count 0 and avg None for a city with no readings
+        window_days: number of days the aggregates cover (None = all history)
+    '''
+
+    def __init__(self, city_ids, city_names, stats, window_days=None):
+        self.city_ids = city_ids
+        self.city_names = city_names
+        self.stats = stats
+        self.window_days = window_days
+
+    def rows(self):
+        '''
+        RETURNS:
+            list of (city_id, city_name, avg_temp, avg_uv, avg_aqi) tuples
+        '''
+        return list(zip(self.city_ids, self.city_names, self.stats['temperature']['avg'],
+                        self.stats['uv']['avg'], self.stats['aqi']['avg']))
+
+    def city_averages(self, metric):
+        '''
+        RETURNS:
+            list of (city_name, average) for the cities with readings for metric
+        '''
+        metric_stats = self.stats[metric]
+        return [(name, avg) for name, count, avg in zip(self.city_names, metric_stats['count'], metric_stats['avg'])
+                if count]
+
+    def city_average(self, metric, city_id):
+        '''
+        RETURNS:
+            (city_name, average) for one city, or None if it has no readings for metric
+        '''
+        if city_id not in self.city_ids:
+            return None
+
+        i = self.city_ids.index(city_id)
+        if not self.stats[metric]['count'][i]:
+            return None
+        return self.city_names[i], self.stats[metric]['avg'][i]
+
+    def overall_average(self, metric):
+        '''
+        RETURNS:
+            average over every reading of metric, or None if there are none
+        '''
+        count = sum(self.stats[metric]['count'])
+        if not count:
+            return None
+        return sum(self.stats[metric]['total']) / count
+
+
+def has_table(db_conn, table):
+    cur = db_conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cur.fetchone() is not None
+
+
+def has_epoch_timestamps(db_conn, table):
+    '''
+    RETURNS:
+        True if table's timestamp column holds UTC epoch seconds (False for databases
+        that haven't been converted yet and still store text)
+    '''
+    cur = db_conn.cursor()
+    cur.execute(f'PRAGMA table_info({table})')
+    types = {row[1]: row[2].upper() for row in cur.fetchall()}
+    return types.get('timestamp') == 'INTEGER'
+
+
+def epoch_expression(db_conn, table):
+    '''
+    RETURNS:
+        SQL expression giving a reading's UTC epoch seconds for table
+    '''
+    if has_epoch_timestamps(db_conn, table):
+        return 'timestamp'
+    return EPOCH_SQL.format(column='timestamp')
+
+
+def day_start(day):
+    '''
+    RETURNS:
+        UTC epoch seconds of local midnight at the start of day ('YYYY-MM-DD'), the
+        same local calendar obs_date uses
+    '''
+    return int(datetime.combine(date.fromisoformat(day), datetime.min.time()).timestamp())
+
+
+def window_epochs(window):
+    '''
+    RETURNS:
+        (start, end) epoch seconds for a (start_date, end_date) window, to be used as
+        timestamp >= start AND timestamp < end
+    '''
+    start_date, end_date = window
+    return day_start(start_date), day_start((date.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+
+
+def window_dates(window_days, end_date=None):
+    '''
+    RETURNS:
+        (start_date, end_date) 'YYYY-MM-DD' strings covering window_days whole days
+        that end on end_date (today by default)
+    '''
+    end = date.fromisoformat(end_date) if end_date else date.today()
+    start = end - timedelta(days=window_days - 1)
+    return start.isoformat(), end.isoformat()
+
+
+def metric_subquery(db_conn, metric, window=None):
+    '''
+    picks the cheapest source for one metric's per-city count and total
+
+    ARGUMENTS:
+        db_conn: open database connection
+        metric: key of METRICS
+        window: optional (start_date, end_date) of obs_dates to include
+
+    RETURNS:
+        (sql, params) selecting city_id, n, total
+    '''
+    table, column = METRICS[metric]
+
+    if window is None and has_table(db_conn, 'City_Metric_Summary'):
+        return ('SELECT city_id, count AS n, total FROM City_Metric_Summary WHERE metric = ?',
+                [metric])
+
+    if window is not None and has_table(db_conn, 'Daily_Rollups'):
+        return ('''SELECT city_id, SUM(count) AS n, SUM(total) AS total FROM Daily_Rollups
+                   WHERE metric = ? AND obs_date BETWEEN ? AND ? GROUP BY city_id''',
+                [metric, *window])
+
+    # databases that store.py hasn't initialized yet only have the raw tables
+    if window is None:
+        return (f'SELECT city_id, COUNT({column}) AS n, SUM({column}) AS total FROM {table} GROUP BY city_id',
+                [])
+    if has_epoch_timestamps(db_conn, table):
+        return (f'''SELECT city_id, COUNT({column}) AS n, SUM({column}) AS total FROM {table}
+                    WHERE timestamp >= ? AND timestamp < ? GROUP BY city_id''',
+                list(window_epochs(window)))
+    return (f'''SELECT city_id, COUNT({column}) AS n, SUM({column}) AS total FROM {table}
+                WHERE DATE(timestamp) BETWEEN ? AND ? GROUP BY city_id''',
+            list(window))
+
+
+def build_metrics_frame(db_conn, window_days=None, end_date=None):
+    '''
+    reads every per-city aggregate in a single query. All-time aggregates come from
+    City_Metric_Summary and windowed ones from Daily_Rollups (both kept by store.py),
+    so the cost grows with cities and days rather than with stored readings
+
+    ARGUMENTS:
+        db_conn: open database connection
+        window_days: only include the last window_days days of readings (None = all history);
+            windows are whole days, so 1 means today's readings
+        end_date: last day of the window as 'YYYY-MM-DD' (today by default)
+
+    RETURNS:
+        MetricsFrame
+    '''
+    window = window_dates(window_days, end_date) if window_days else None
+
+    joins = []
+    params = []
+    for metric in METRICS:
+        sql, metric_params = metric_subquery(db_conn, metric, window)
+        joins.append(f'LEFT JOIN ({sql}) AS {metric}_stats ON {metric}_stats.city_id = Cities.city_id')
+        params.extend(metric_params)
+
+    columns = ', '.join(f'{metric}_stats.n, {metric}_stats.total, {metric}_stats.total / {metric}_stats.n'
+                        for metric in METRICS)
+    join_sql = '\n'.join(joins)
+
+    cur = db_conn.cursor()
+    cur.execute(f'''
+        SELECT Cities.city_id, Cities.city_name, {columns}
+        FROM Cities
+        {join_sql}
+        ORDER BY Cities.city_id
+    ''', params)
+    rows = cur.fetchall()
+
+    city_ids = [row[0] for row in rows]
+    city_names = [row[1] for row in rows]
+    stats = {}
+    for offset, metric in enumerate(METRICS):
+        column = 2 + offset * 3
+        stats[metric] = {
+            'count': [row[column] or 0 for row in rows],
+            'total': [row[column + 1] or 0.0 for row in rows],
+            'avg': [row[column + 2] for row in rows],
+        }
+
+    return MetricsFrame(city_ids, city_names, stats, window_days)
+
+
+def data_version(db_conn):
+    '''
+    cheap fingerprint of the stored readings: each measurement table's newest rowid
+    plus every metric's reading count and total. With City_Metric_Summary (kept by
+    store.py's triggers) none of the measurement tables is scanned
+
+    rows added change the rowid and count; rows deleted change the count once the
+    summary is rebuilt (store.py --rebuild-summary). Readings edited in place don't
+    change it
+
+    RETURNS:
+        list that differs whenever the readings behind the aggregates do
+    '''
+    cur = db_conn.cursor()
+    version = []
+    for metric, (table, column) in METRICS.items():
+        cur.execute(f'SELECT MAX(rowid) FROM {table}')
+        newest = cur.fetchone()[0]
+        if has_table(db_conn, 'City_Metric_Summary'):
+            cur.execute('SELECT SUM(count), SUM(total) FROM City_Metric_Summary WHERE metric = ?', (metric,))
+        else:
+            cur.execute(f'SELECT COUNT({column}), SUM({column}) FROM {table}')
+        version.append([metric, newest, *cur.fetchone()])
+
+    cur.execute('SELECT COUNT(*), MAX(city_id) FROM Cities')
+    version.append(['cities', *cur.fetchone()])
+    return version
@@ -0,0 +1,174 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+from dimensions import WriterDimensions, get_dimension_cache
+
+
+QUEUE_SIZE = 100
+
+FLUSH_INTERVAL = 5  # most seconds a fetched record waits in memory before it is written
+
+_STOP = object()
+
+
+def flush_rows(conn, insert_sql, rows):
+    '''
+    inserts every pending row with one executemany and commits them as a single transaction
+
+    ARGUMENTS:
+        conn: open database connection
+        insert_sql: parameterized INSERT statement
+        rows: list of parameter tuples (cleared once written)
+    '''
+    if rows:
+        conn.executemany(insert_sql, rows)
+        rows.clear()
+    conn.commit()
+
+
+def run_pipeline(city_names, fetch_fn, write_fn, insert_sql, db_name, max_workers=5,
+                 max_stores=25, batch_size=None, queue_size=QUEUE_SIZE, flush_interval=FLUSH_INTERVAL):
+    '''
+    streams cities from fetcher threads through a bounded queue to a single writer thread
+
+    the fetchers block when the queue is full, so a slow database holds back the network
+    side instead of piling responses up in memory. The writer keeps the fetched records
+    in memory and only touches the database when it flushes them: each flush turns the
+    records into rows with write_fn, inserts them and commits, all in one short
+    transaction, so the write lock is never held while a request is in flight. It stops
+    the fetchers once max_stores rows are stored, and flushes whatever is left before
+    the pipeline returns.
+
+    ARGUMENTS:
+        city_names: list of city names to fetch
+        fetch_fn: function(cities, stop) -> list of (city, data, error), e.g.
+            Collector.fetch_batch; it should make no new requests once the stop
+            event is set
+        write_fn: function(cur, dimensions, city, data, pending_keys) -> (row tuple for
+            insert_sql, message printed once the row is committed), or None to skip the
+            city; runs inside the flush's transaction
+        insert_sql: parameterized INSERT used for the rows
+        db_name: SQLite database file
+        max_workers: fetcher threads (most requests in flight at once)
+        max_stores: most rows stored per run (None = no limit)
+        batch_size: most records per transaction (None = no size limit)
+        queue_size: most fetched responses waiting for the writer
+        flush_interval: most seconds a record waits before its transaction
+
+    RETURNS:
+        number of rows stored
+    '''
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    outcome = {'stored': 0, 'error': None, 'drained': False}
+
+    def fetcher(cities):
+        if stop.is_set():
+            return
+        for item in fetch_fn(cities, stop):
+            results.put(item)
+
+    def writer():
+        try:
+            with db.connection(db_name) as conn:
+                write_records(conn)
+        except Exception as e:
+            outcome['error'] = e
+            # keep draining so no fetcher stays blocked on a full queue; once _STOP has been
+            # taken off the queue the fetchers are finished and nothing more will arrive
+            stop.set()
+            while not outcome['drained']:
+                outcome['drained'] = results.get() is _STOP
+
+    def write_records(conn):
+        dimensions = WriterDimensions(get_dimension_cache(db_name))
+        pending_keys = set()
+        records = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = results.get(timeout=timeout)
+            except queue.Empty:
+                flush(conn, dimensions, pending_keys, records)
+                deadline = None
+                continue
+
+            if item is _STOP:
+                outcome['drained'] = True
+                break
+            city, data, error = item
+            if stop.is_set():
+                continue
+            if error is not None:
+                print(f"Error for {city}: {error}")
+                continue
+
+            records.append((city, data))
+            if deadline is None:
+                deadline = time.monotonic() + flush_interval
+
+            # rows only count once they are written (a record can still turn out to be
+            # a duplicate), so flush as soon as the buffered records could reach the limit
+            at_limit = max_stores and outcome['stored'] + len(records) >= max_stores
+            if at_limit or (batch_size and len(records) >= batch_size):
+                flush(conn, dimensions, pending_keys, records)
+                deadline = None
+
+            if max_stores and outcome['stored'] >= max_stores:
+                print(f"Reached limit of {max_stores} cities per run")
+                stop.set()
+
+        flush(conn, dimensions, pending_keys, records)
+
+    def flush(conn, dimensions, pending_keys, records):
+        if not records:
+            return
+
+        cur = conn.cursor()
+        try:
+            cur.execute('BEGIN IMMEDIATE')
+            rows = []
+            messages = []
+            for city, data in records:
+                try:
+                    written = write_fn(cur, dimensions, city, data, pending_keys)
+                except sqlite3.Error:
+                    raise
+                except Exception as e:
+                    print(f"Error for {city}: {e}")
+                    continue
+                if written is not None:
+                    rows.append(written[0])
+                    messages.append(written[1])
+            flush_rows(conn, insert_sql, rows)
+        except Exception:
+            # the new Cities rows went with the transaction, so their ids must not be used
+            conn.rollback()
+            dimensions.discard()
+            raise
+
+        dimensions.publish()
+        for message in messages:
+            print(message)
+        outcome['stored'] += len(messages)
+        records.clear()
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(fetcher, ([city] for city in city_names)))
+    finally:
+        results.put(_STOP)
+        writer_thread.join()
+
+    if outcome['error'] is not None:
+        raise outcome['error']
+    return outcome['stored']
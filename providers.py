@@ -0,0 +1,213 @@
+import http_client
+import response_cache
+
+
+OPENWEATHER_BASE_URL = 'http://api.openweathermap.org/data/2.5/weather'
+OPENWEATHER_GROUP_URL = 'http://api.openweathermap.org/data/2.5/group'
+OPENUV_BASE_URL = 'https://api.openuv.io/api/v1/uv'
+WEATHERAPI_BASE_URL = 'http://api.weatherapi.com/v1/current.json'
+
+
+class Provider:
+    '''
+    everything the collector engine needs to know about one metric source;
+    a new source only needs a Provider added to PROVIDERS
+
+    ARGUMENTS:
+        name: provider key (response cache, rate limits, scheduler quotas)
+        metric: metric key the readings are stored under (metrics.METRICS is built from these)
+        label: name used in messages, e.g. 'air quality'
+        url: per-city endpoint
+        auth: function(api_key) -> (params, headers) that authenticate a request
+        build_params: function(city, context) -> query params for one city
+        extract: function(response json) -> {field: value}
+        table: measurement table the readings go into
+        columns: [(column, SQL type)] stored after city_id, in insert order
+        message: format string for the "Stored ..." line, filled from the extracted fields
+        key_file: file holding the API key
+        lookups: {column: (dimension, field)} for columns stored as the id of the extracted
+            value in a dimension table (a key of dimensions.DIMENSIONS)
+        cache_query: function(city, context) -> response cache query (the city by default)
+        needs_coordinates: True if build_params looks cities up in context = {city: (lat, lng)},
+            so cities without coordinates are skipped
+        max_workers: most requests in flight at once
+        rate: requests per second
+        daily_quota: requests allowed per day (None = no limit)
+        ttl: seconds a cached response stays fresh
+        bulk_limit: most cities per bulk request (1 = no bulk endpoint)
+        bulk_filter: function(cities) -> the cities a bulk request can carry
+        bulk_request: function(api_key, cities) -> {city: response json}, one HTTP request
+        bulk_url: endpoint bulk_request sends to, if it isn't url
+        on_response: function(city, response json) called after every per-city request
+    '''
+
+    def __init__(self, name, metric, label, url, auth, build_params, extract, table, columns, message,
+                 key_file, lookups=None, cache_query=None, needs_coordinates=False, max_workers=5, rate=5,
+                 daily_quota=None, ttl=response_cache.DEFAULT_TTL, bulk_limit=1, bulk_filter=None,
+                 bulk_request=None, bulk_url=None, on_response=None):
+        self.name = name
+        self.metric = metric
+        self.label = label
+        self.url = url
+        self.auth = auth
+        self.build_params = build_params
+        self.extract = extract
+        self.table = table
+        self.columns = columns
+        self.message = message
+        self.key_file = key_file
+        self.lookups = lookups or {}
+        self.cache_query = cache_query or (lambda city, context: city)
+        self.needs_coordinates = needs_coordinates
+        self.max_workers = max_workers
+        self.rate = rate
+        self.daily_quota = daily_quota
+        self.ttl = ttl
+        self.bulk_limit = bulk_limit
+        self.bulk_filter = bulk_filter or list
+        self.bulk_request = bulk_request
+        self.bulk_url = bulk_url
+        self.on_response = on_response
+
+    @property
+    def value_column(self):
+        '''
+        RETURNS:
+            the column holding the metric (the first one)
+        '''
+        return self.columns[0][0]
+
+    @property
+    def urls(self):
+        '''
+        RETURNS:
+            every endpoint the provider's requests go to (for http_client.requests_sent)
+        '''
+        return [self.url] + ([self.bulk_url] if self.bulk_url and self.bulk_url != self.url else [])
+
+
+def query_param_auth(param):
+    return lambda api_key: ({param: api_key}, {})
+
+
+def header_auth(header):
+    return lambda api_key: ({}, {header: api_key})
+
+
+def remember_openweather_id(city, data):
+    # the group endpoint only takes city ids, so keep the id of every city we've looked up
+    if 'id' in data:
+        response_cache.put_location_id('openweather', city, data['id'])
+
+
+def known_openweather_ids(cities):
+    return [city for city in cities if response_cache.get_location_id('openweather', city)]
+
+
+def request_openweather_group(api_key, cities):
+    city_ids = {response_cache.get_location_id('openweather', city): city for city in cities}
+    params = {
+        'id': ','.join(city_ids),
+        'appid': api_key,
+        'units': 'imperial'
+    }
+
+    response = http_client.get(OPENWEATHER_GROUP_URL, params=params)
+    response.raise_for_status()
+
+    found = {}
+    for data in response.json().get('list', []):
+        city = city_ids.get(str(data.get('id')))
+        if city is not None:
+            found[city] = data
+    return found
+
+
+def request_weatherapi_bulk(api_key, cities):
+    params = {
+        'key': api_key,
+        'q': 'bulk',
+        'aqi': 'yes'
+    }
+    body = {'locations': [{'q': city, 'custom_id': str(i)} for i, city in enumerate(cities)]}
+
+    response = http_client.post(WEATHERAPI_BASE_URL, params=params, json=body)
+    response.raise_for_status()
+
+    found = {}
+    for item in response.json().get('bulk', []):
+        data = item.get('query', {})
+        # locations the provider couldn't resolve come back with an error instead of current
+        if 'current' not in data or not str(data.get('custom_id', '')).isdigit():
+            continue
+        i = int(data['custom_id'])
+        if i < len(cities):
+            found[cities[i]] = data
+    return found
+
+
+OPENWEATHER = Provider(
+    name='openweather',
+    metric='temperature',
+    label='weather',
+    url=OPENWEATHER_BASE_URL,
+    auth=query_param_auth('appid'),
+    build_params=lambda city, context: {'q': city, 'units': 'imperial'},
+    extract=lambda data: {
+        'temperature': data['main']['temp'],
+        'weather_condition': data['weather'][0]['main']
+    },
+    table='Weather_Data',
+    columns=[('temperature', 'REAL'), ('condition_id', 'INTEGER')],
+    message='Temp = {temperature}°F, Condition = {weather_condition}',
+    key_file='openweather_api_key.txt',
+    lookups={'condition_id': ('condition', 'weather_condition')},
+    daily_quota=1000,
+    # the group endpoint takes up to 20 city ids but no names
+    bulk_limit=20,
+    bulk_filter=known_openweather_ids,
+    bulk_request=request_openweather_group,
+    bulk_url=OPENWEATHER_GROUP_URL,
+    on_response=remember_openweather_id
+)
+
+# OpenUV has no bulk endpoint and looks cities up by coordinates (context = {city: (lat, lng)})
+OPENUV = Provider(
+    name='openuv',
+    metric='uv',
+    label='UV',
+    url=OPENUV_BASE_URL,
+    auth=header_auth('x-access-token'),
+    build_params=lambda city, context: {'lat': context[city][0], 'lng': context[city][1]},
+    extract=lambda data: {'uv_index': data['result']['uv']},
+    table='UV_Data',
+    columns=[('uv_index', 'REAL')],
+    message='UV Index = {uv_index}',
+    key_file='openuv_api_key.txt',
+    cache_query=lambda city, context: context[city],
+    needs_coordinates=True,
+    max_workers=2,
+    rate=2,
+    daily_quota=50
+)
+
+# bulk (POST q=bulk, up to 50 locations) is only on paid plans; elsewhere the first
+# bulk request fails and the collector goes back to per-city requests
+WEATHERAPI = Provider(
+    name='weatherapi',
+    metric='aqi',
+    label='air quality',
+    url=WEATHERAPI_BASE_URL,
+    auth=query_param_auth('key'),
+    build_params=lambda city, context: {'q': city, 'aqi': 'yes'},
+    extract=lambda data: {'aqi_value': data['current']['air_quality']['us-epa-index']},
+    table='Air_Quality_Data',
+    columns=[('aqi_value', 'REAL')],
+    message='AQI = {aqi_value}',
+    key_file='weatherapi_api_key.txt',
+    daily_quota=30000,
+    bulk_limit=50,
+    bulk_request=request_weatherapi_bulk
+)
+
+PROVIDERS = {provider.name: provider for provider in (OPENWEATHER, OPENUV, WEATHERAPI)}
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+
+import db
+
+
+CACHE_DB = 'response_cache.db'
+
+DEFAULT_TTL = 3 * 60 * 60  # seconds a parsed provider response stays fresh (see Provider.ttl)
+
+MAX_ENTRIES = 10000
+
+_conn = None
+_lock = threading.Lock()
+
+
+def get_connection():
+    global _conn
+    if _conn is None:
+        # shared by every fetcher thread; all access goes through _lock
+        _conn = db.connect(CACHE_DB, check_same_thread=False)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS Responses (
+                cache_key TEXT PRIMARY KEY,
+                provider TEXT,
+                body TEXT,
+                stored_at REAL,
+                last_used REAL
+            )
+        ''')
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON Responses (last_used)')
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS Locations (
+                cache_key TEXT PRIMARY KEY,
+                location_id TEXT
+            )
+        ''')
+        _conn.commit()
+    return _conn
+
+
+def make_key(provider, query):
+    '''
+    normalizes a query so "New York", " new york " and the same coordinates
+    written with different precision share a cache entry
+
+    ARGUMENTS:
+        provider: provider name
+        query: city name or (lat, lng) tuple
+    '''
+    if isinstance(query, (tuple, list)):
+        normalized = ','.join(f'{float(value):.4f}' for value in query)
+    else:
+        normalized = ' '.join(str(query).lower().split())
+    return f'{provider}:{normalized}'
+
+
+def get(provider, query, ttl=DEFAULT_TTL):
+    '''
+    RETURNS:
+        the cached data for provider + query, or None if missing or older than ttl seconds
+    '''
+    key = make_key(provider, query)
+    now = time.time()
+
+    with _lock:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute('SELECT body, stored_at FROM Responses WHERE cache_key = ?', (key,))
+        result = cur.fetchone()
+        if result is None:
+            return None
+
+        body, stored_at = result
+        if now - stored_at > ttl:
+            cur.execute('DELETE FROM Responses WHERE cache_key = ?', (key,))
+            conn.commit()
+            return None
+
+        cur.execute('UPDATE Responses SET last_used = ? WHERE cache_key = ?', (now, key))
+        conn.commit()
+        return json.loads(body)
+
+
+def put(provider, query, data):
+    '''
+    stores data for provider + query, evicting the least recently used entries
+    once there are more than MAX_ENTRIES
+    '''
+    key = make_key(provider, query)
+    now = time.time()
+
+    with _lock:
+        conn = get_connection()
+        conn.execute('''
+            INSERT OR REPLACE INTO Responses (cache_key, provider, body, stored_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, provider, json.dumps(data), now, now))
+        conn.execute('''
+            DELETE FROM Responses WHERE cache_key IN (
+                SELECT cache_key FROM Responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (MAX_ENTRIES,))
+        conn.commit()
+
+
+def get_location_id(provider, query):
+    '''
+    RETURNS:
+        the provider's own id for a city (e.g. an OpenWeatherMap city id), or None if
+        no response for the city has been seen yet
+    '''
+    with _lock:
+        cur = get_connection().cursor()
+        cur.execute('SELECT location_id FROM Locations WHERE cache_key = ?', (make_key(provider, query),))
+        result = cur.fetchone()
+    return result[0] if result else None
+
+
+def put_location_id(provider, query, location_id):
+    '''
+    remembers the provider's id for a city; ids don't change, so these never expire
+    '''
+    with _lock:
+        conn = get_connection()
+        conn.execute('INSERT OR REPLACE INTO Locations (cache_key, location_id) VALUES (?, ?)',
+                     (make_key(provider, query), str(location_id)))
+        conn.commit()
+
+
+def clear(provider=None):
+    with _lock:
+        conn = get_connection()
+        if provider is None:
+            conn.execute('DELETE FROM Responses')
+        else:
+            conn.execute('DELETE FROM Responses WHERE provider = ?', (provider,))
+        conn.commit()
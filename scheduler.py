@@ -0,0 +1,218 @@
+import argparse
+import csv
+from datetime import datetime
+
+import db
+import http_client
+from providers import PROVIDERS
+from store import CITIES, CITY_COORDS, DB_NAME, init_database, store_provider
+
+
+CHUNK_SIZE = 25
+
+
+def load_catalog_file(filename):
+    '''
+    reads a city catalog CSV with a city_name column and optional lat / lon columns
+
+    RETURNS:
+        (city_names, city_coordinates) where city_coordinates only has the
+        cities that had both lat and lon
+    '''
+    city_names = []
+    city_coordinates = {}
+
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            name = row['city_name'].strip()
+            if not name:
+                continue
+            city_names.append(name)
+            if row.get('lat') and row.get('lon'):
+                city_coordinates[name] = (float(row['lat']), float(row['lon']))
+
+    return city_names, city_coordinates
+
+
+def load_catalog(db_name=DB_NAME):
+    '''
+    RETURNS:
+        every city in the Cities table ordered by city_id, or CITIES if the table is empty
+    '''
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT city_name FROM Cities ORDER BY city_id')
+        city_names = [row[0] for row in cur.fetchall()]
+    return city_names or list(CITIES)
+
+
+def init_scheduler_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Collection_Cursors (
+            cursor_key TEXT PRIMARY KEY,
+            position INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Provider_Usage (
+            provider TEXT,
+            usage_date TEXT,
+            calls INTEGER,
+            PRIMARY KEY (provider, usage_date)
+        )
+    ''')
+    conn.commit()
+
+
+def get_cursor(conn, cursor_key):
+    cur = conn.cursor()
+    cur.execute('SELECT position FROM Collection_Cursors WHERE cursor_key = ?', (cursor_key,))
+    result = cur.fetchone()
+    return result[0] if result else 0
+
+
+def save_cursor(conn, cursor_key, position):
+    conn.execute('''
+        INSERT INTO Collection_Cursors (cursor_key, position) VALUES (?, ?)
+        ON CONFLICT (cursor_key) DO UPDATE SET position = excluded.position
+    ''', (cursor_key, position))
+    conn.commit()
+
+
+def reserve_quota(conn, provider, wanted, usage_date=None):
+    '''
+    claims up to wanted requests from usage_date's (today's) quota for provider
+    (its Provider.daily_quota; a provider without one is granted every request)
+
+    the read and the update happen in one IMMEDIATE transaction, so shards running in
+    other processes can't hand out the same part of the quota twice. The claim is only
+    a ceiling while a chunk runs; settle_quota replaces it with the requests made
+
+    RETURNS:
+        number of requests that may be made (0 once the quota is used up)
+    '''
+    today = usage_date or datetime.now().strftime('%Y-%m-%d')
+    cur = conn.cursor()
+
+    cur.execute('BEGIN IMMEDIATE')
+    cur.execute('SELECT calls FROM Provider_Usage WHERE provider = ? AND usage_date = ?', (provider, today))
+    result = cur.fetchone()
+    used = result[0] if result else 0
+
+    quota = PROVIDERS[provider].daily_quota
+    granted = wanted if quota is None else max(0, min(wanted, quota - used))
+    if granted:
+        cur.execute('''
+            INSERT INTO Provider_Usage (provider, usage_date, calls) VALUES (?, ?, ?)
+            ON CONFLICT (provider, usage_date) DO UPDATE SET calls = calls + excluded.calls
+        ''', (provider, today, granted))
+    conn.commit()
+    return granted
+
+
+def settle_quota(conn, provider, reserved, sent, usage_date):
+    '''
+    swaps a reservation for the requests actually sent: cities already stored today or
+    answered from the response cache cost nothing, while bulk requests, failed bulk
+    requests and retries all count
+    '''
+    conn.execute('''
+        UPDATE Provider_Usage SET calls = MAX(0, calls + ?)
+        WHERE provider = ? AND usage_date = ?
+    ''', (sent - reserved, provider, usage_date))
+    conn.commit()
+
+
+def run_provider(provider, store_fn, city_names, db_name=DB_NAME, shard_index=0, shard_count=1,
+                 chunk_size=CHUNK_SIZE):
+    '''
+    walks this shard's part of the catalog once, chunk by chunk, starting from the saved
+    cursor; the cursor is saved after every chunk, so a crashed run resumes at the chunk
+    it was on (the per-day dedup check skips any rows that chunk already stored)
+
+    ARGUMENTS:
+        provider: key of PROVIDERS
+        store_fn: function(chunk) that stores one chunk of cities
+        city_names: full city catalog
+        db_name: SQLite database file
+        shard_index, shard_count: this worker takes every shard_count-th city
+        chunk_size: cities per store_fn call
+
+    RETURNS:
+        number of rows stored
+    '''
+    shard = city_names[shard_index::shard_count]
+    if not shard:
+        return 0
+
+    cursor_key = f'{provider}:{shard_index}/{shard_count}'
+    urls = PROVIDERS[provider].urls
+    with db.connection(db_name) as conn:
+        init_scheduler_tables(conn)
+
+        stored = 0
+        visited = 0
+        position = get_cursor(conn, cursor_key) % len(shard)
+
+        while visited < len(shard):
+            today = datetime.now().strftime('%Y-%m-%d')
+            wanted = min(chunk_size, len(shard) - visited, len(shard) - position)
+            granted = reserve_quota(conn, provider, wanted, today)
+            if not granted:
+                print(f"Daily quota for {provider} used up, stopping at position {position}")
+                break
+
+            chunk = shard[position:position + granted]
+            sent = http_client.requests_sent(urls)
+            try:
+                stored += store_fn(chunk)
+            finally:
+                settle_quota(conn, provider, granted, http_client.requests_sent(urls) - sent, today)
+
+            visited += len(chunk)
+            position = (position + len(chunk)) % len(shard)
+            save_cursor(conn, cursor_key, position)
+
+    return stored
+
+
+def run_schedule(city_names, city_coordinates, db_name=DB_NAME, shard_index=0, shard_count=1,
+                 chunk_size=CHUNK_SIZE):
+    for name, provider in PROVIDERS.items():
+        # a chunk stores at most one row per city, so it needs no max_stores of its own
+        def store_fn(chunk, provider=provider):
+            return store_provider(provider, chunk, db_name, city_coordinates, max_stores=None)
+
+        catalog = city_names
+        if provider.needs_coordinates:
+            # only walk the cities that have coordinates, the rest would never make a request
+            catalog = [city for city in city_names if city in city_coordinates]
+
+        print("\n" + "="*50)
+        print(f"COLLECTING {name.upper()} (shard {shard_index + 1} of {shard_count})")
+        print("="*50)
+        stored = run_provider(name, store_fn, catalog, db_name, shard_index, shard_count, chunk_size)
+        print(f"{name}: {stored} records stored this run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collect weather data for a large city catalog')
+    parser.add_argument('--catalog', help='CSV with city_name, lat, lon columns (default: Cities table)')
+    parser.add_argument('--shard', type=int, default=0, help='index of this worker (0-based)')
+    parser.add_argument('--shards', type=int, default=1, help='total number of workers')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='cities stored per chunk')
+    args = parser.parse_args()
+
+    init_database()
+
+    if args.catalog:
+        city_names, city_coordinates = load_catalog_file(args.catalog)
+    else:
+        city_names, city_coordinates = load_catalog(), dict(CITY_COORDS)
+
+    run_schedule(city_names, city_coordinates, DB_NAME, args.shard, args.shards, args.chunk_size)
+    db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
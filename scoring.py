@@ -0,0 +1,57 @@
+import numpy as np
+
+
+SCORE_WEIGHTS = (0.3, 0.3, 0.4)  # temperature, UV, AQI
+IDEAL_TEMP = 70.0
+TEMP_RANGE = 30.0
+UV_MAX = 12.0
+AQI_MAX = 6.0
+
+
+def component_scores(avg_temps, avg_uvs, avg_aqis, ideal_temp=IDEAL_TEMP, temp_range=TEMP_RANGE,
+                     uv_max=UV_MAX, aqi_max=AQI_MAX):
+    '''
+    normalizes each metric so 0 is best and 1 is the far end of the usual range
+
+    ARGUMENTS:
+        avg_temps, avg_uvs, avg_aqis: per-city averages (lists or arrays of the same length)
+        ideal_temp: temperature (°F) that scores 0
+        temp_range: degrees away from ideal_temp that score 1
+        uv_max: UV index that scores 1
+        aqi_max: US EPA index that scores 1
+
+    RETURNS:
+        (temp_scores, uv_scores, aqi_scores) float arrays
+    '''
+    temp_scores = np.abs(np.asarray(avg_temps, dtype=float) - ideal_temp) / temp_range
+    uv_scores = np.asarray(avg_uvs, dtype=float) / uv_max
+    aqi_scores = np.asarray(avg_aqis, dtype=float) / aqi_max
+    return temp_scores, uv_scores, aqi_scores
+
+
+def compute_safety_scores(avg_temps, avg_uvs, avg_aqis, weights=SCORE_WEIGHTS, ideal_temp=IDEAL_TEMP,
+                          temp_range=TEMP_RANGE, uv_max=UV_MAX, aqi_max=AQI_MAX):
+    '''
+    weighted composite safety score for every city at once (lower = safer)
+
+    ARGUMENTS:
+        avg_temps, avg_uvs, avg_aqis: per-city averages (lists or arrays of the same length)
+        weights: (temperature, UV, AQI) weights
+        ideal_temp, temp_range, uv_max, aqi_max: normalizers passed to component_scores
+
+    RETURNS:
+        float array of composite scores, one per city
+    '''
+    temp_scores, uv_scores, aqi_scores = component_scores(avg_temps, avg_uvs, avg_aqis, ideal_temp,
+                                                          temp_range, uv_max, aqi_max)
+    temp_weight, uv_weight, aqi_weight = weights
+    return (temp_scores * temp_weight) + (uv_scores * uv_weight) + (aqi_scores * aqi_weight)
+
+
+def rank_by_score(scores):
+    '''
+    RETURNS:
+        indexes that put scores in ascending order (safest first); ties keep
+        their original order
+    '''
+    return np.argsort(np.asarray(scores, dtype=float), kind='stable')
@@ -1,7 +1,11 @@
-import requests
-import sqlite3
-import time
-from datetime import datetime
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+from collector import collect, create_measurement_table
+from metrics import EPOCH_SQL, has_epoch_timestamps, has_table
+from providers import PROVIDERS
 
 
 def get_api_key(filename):
@@ -21,13 +25,7 @@ def get_api_key(filename):
         return None
 
 
-OPENWEATHER_API_KEY = get_api_key('openweather_api_key.txt')
-OPENUV_API_KEY = get_api_key('openuv_api_key.txt')
-WEATHERAPI_KEY = get_api_key('weatherapi_api_key.txt')
-
-OPENWEATHER_BASE_URL = 'http://api.openweathermap.org/data/2.5/weather'
-OPENUV_BASE_URL = 'https://api.openuv.io/api/v1/uv'
-WEATHERAPI_BASE_URL = 'http://api.weatherapi.com/v1/current.json'
+API_KEYS = {name: get_api_key(provider.key_file) for name, provider in PROVIDERS.items()}
 
 DB_NAME = 'weather_data.db'
 
@@ -68,323 +66,336 @@ CITY_COORDS = {
 }
 
 
-def init_database():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+MEASUREMENT_TABLES = [provider.table for provider in PROVIDERS.values()]
+
+
+def add_obs_date_column(cur, table):
+    '''
+    adds and backfills the obs_date column on a measurement table created
+    before the column existed
+
+    ARGUMENTS:
+        cur: database cursor
+        table: measurement table name
+    '''
+    cur.execute(f'PRAGMA table_info({table})')
+    columns = [row[1] for row in cur.fetchall()]
     
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS Cities (
-            city_id INTEGER PRIMARY KEY,
-            city_name TEXT UNIQUE
-        )
-    ''')
+    if 'obs_date' not in columns:
+        cur.execute(f'ALTER TABLE {table} ADD COLUMN obs_date TEXT')
+        cur.execute(f'UPDATE {table} SET obs_date = DATE(timestamp) WHERE obs_date IS NULL')
+
+
+def check_timestamps(cur, table):
+    '''
+    makes sure every text timestamp in table converts to epoch seconds before
+    migrate_epoch_timestamps rebuilds it: strftime gives NULL for text it can't read,
+    and the original text would be dropped with the old table
     
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS Weather_Conditions (
-            condition_id INTEGER PRIMARY KEY,
-            condition_name TEXT UNIQUE
-        )
-    ''')
+    ARGUMENTS:
+        cur: database cursor
+        table: measurement table name
+    '''
+    if has_epoch_timestamps(cur.connection, table):
+        return
     
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS Weather_Data (
-            id INTEGER PRIMARY KEY,
-            city_id INTEGER,
-            temperature REAL,
-            condition_id INTEGER,
-            timestamp TEXT,
-            FOREIGN KEY (city_id) REFERENCES Cities(city_id),
-            FOREIGN KEY (condition_id) REFERENCES Weather_Conditions(condition_id)
-        )
+    cur.execute(f'''
+        SELECT COUNT(*), MIN(timestamp) FROM {table}
+        WHERE timestamp IS NOT NULL AND {EPOCH_SQL.format(column='timestamp')} IS NULL
     ''')
+    count, example = cur.fetchone()
+    if count:
+        raise ValueError(f"{table} has {count} timestamps that can't be converted to epoch seconds "
+                         f"(e.g. {example!r}); fix or delete those rows, then run again")
+
+
+def migrate_epoch_timestamps(cur, table):
+    '''
+    rebuilds a measurement table whose timestamp column is still TEXT so that it holds
+    UTC epoch seconds in an INTEGER column; every other column (and obs_date, the local
+    date) is copied as is. Naive text timestamps are read as local time, the ones with
+    a Z or an offset as given. A dropped table takes its triggers and indexes with it,
+    so init_database recreates them afterwards. Text that can't be read would become
+    NULL, so callers run check_timestamps on every table first
+    
+    ARGUMENTS:
+        cur: database cursor
+        table: measurement table name
+    
+    RETURNS:
+        number of rows converted (0 if the table already stores epoch seconds)
+    '''
+    if has_epoch_timestamps(cur.connection, table):
+        return 0
+    
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    create_sql = cur.fetchone()[0]
+    cur.execute(f'PRAGMA table_info({table})')
+    columns = [row[1] for row in cur.fetchall()]
+    
+    new_table = f'{table}_epoch'
+    create_sql = re.sub(r'\btimestamp\s+TEXT\b', 'timestamp INTEGER', create_sql, count=1, flags=re.I)
+    create_sql = re.sub(rf'^CREATE TABLE\s+("?){table}\1', f'CREATE TABLE {new_table}', create_sql, flags=re.I)
+    
+    select = ', '.join(EPOCH_SQL.format(column=column) if column == 'timestamp' else column for column in columns)
+    cur.execute(f'DROP TABLE IF EXISTS {new_table}')
+    cur.execute(create_sql)
+    cur.execute(f'INSERT INTO {new_table} ({", ".join(columns)}) SELECT {select} FROM {table}')
+    converted = cur.rowcount
+    cur.execute(f'DROP TABLE {table}')
+    cur.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+    return converted
+
+
+def create_measurement_indexes(cur, table):
+    # older databases hold more than one row per city per day, so this index can't be UNIQUE
+    cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{table.lower()}_city_date ON {table} (city_id, obs_date)')
+    # time ranges are plain integer comparisons on this index
+    cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{table.lower()}_timestamp ON {table} (timestamp)')
+
+
+def convert_timestamps(db_name=DB_NAME):
+    '''
+    converts an existing database's text timestamps to UTC epoch seconds in place
+    (init_database does the same for the tables it knows about)
+    
+    RETURNS:
+        number of rows converted
+    '''
+    converted = 0
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        tables = [table for table in MEASUREMENT_TABLES if has_table(conn, table)]
+        # checked up front, so nothing (not even obs_date) is changed if a table can't be converted
+        for table in tables:
+            check_timestamps(cur, table)
+        
+        for table in tables:
+            add_obs_date_column(cur, table)
+            rows = migrate_epoch_timestamps(cur, table)
+            create_measurement_indexes(cur, table)
+            print(f"{table}: converted {rows} timestamps")
+            converted += rows
+        
+        # the rebuilt tables lost their triggers; put them back if the database has summaries
+        if has_table(conn, 'City_Metric_Summary'):
+            create_summary_table(cur)
+        if has_table(conn, 'Daily_Rollups'):
+            create_rollup_table(cur)
+        conn.commit()
+    return converted
+
+
+def fill_summary_table(cur):
+    '''
+    recomputes every row of City_Metric_Summary from the measurement tables
+    '''
+    cur.execute('DELETE FROM City_Metric_Summary')
+    for provider in PROVIDERS.values():
+        metric, table, column = provider.metric, provider.table, provider.value_column
+        cur.execute(f'''
+            INSERT INTO City_Metric_Summary (city_id, metric, total, count, min_value, max_value)
+            SELECT city_id, ?, SUM({column}), COUNT({column}), MIN({column}), MAX({column})
+            FROM {table}
+            WHERE {column} IS NOT NULL
+            GROUP BY city_id
+        ''', (metric,))
+
+
+def create_summary_table(cur):
+    '''
+    creates City_Metric_Summary (running total, count, min and max of each metric per city)
+    and the triggers that keep it current; a new summary table is filled from existing rows
+    '''
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'City_Metric_Summary'")
+    existed = cur.fetchone() is not None
     
     cur.execute('''
-        CREATE TABLE IF NOT EXISTS UV_Data (
-            id INTEGER PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS City_Metric_Summary (
             city_id INTEGER,
-            uv_index REAL,
-            timestamp TEXT,
+            metric TEXT,
+            total REAL,
+            count INTEGER,
+            min_value REAL,
+            max_value REAL,
+            PRIMARY KEY (city_id, metric),
             FOREIGN KEY (city_id) REFERENCES Cities(city_id)
         )
     ''')
     
+    # triggers run inside the inserting statement's transaction, so the summary is updated
+    # atomically with every collector's batch (and by any other script writing the tables)
+    for provider in PROVIDERS.values():
+        metric, table, column = provider.metric, provider.table, provider.value_column
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table.lower()}_summary
+            AFTER INSERT ON {table}
+            WHEN NEW.{column} IS NOT NULL
+            BEGIN
+                INSERT INTO City_Metric_Summary (city_id, metric, total, count, min_value, max_value)
+                VALUES (NEW.city_id, '{metric}', NEW.{column}, 1, NEW.{column}, NEW.{column})
+                ON CONFLICT (city_id, metric) DO UPDATE SET
+                    total = total + excluded.total,
+                    count = count + 1,
+                    min_value = MIN(min_value, excluded.min_value),
+                    max_value = MAX(max_value, excluded.max_value);
+            END
+        ''')
+    
+    if not existed:
+        fill_summary_table(cur)
+
+
+def fill_rollup_table(cur):
+    '''
+    recomputes every row of Daily_Rollups from the measurement tables
+    '''
+    cur.execute('DELETE FROM Daily_Rollups')
+    for provider in PROVIDERS.values():
+        metric, table, column = provider.metric, provider.table, provider.value_column
+        cur.execute(f'''
+            INSERT INTO Daily_Rollups (city_id, metric, obs_date, total, count, min_value, max_value)
+            SELECT city_id, ?, COALESCE(obs_date, DATE(timestamp, 'unixepoch', 'localtime')) AS day,
+                   SUM({column}), COUNT({column}), MIN({column}), MAX({column})
+            FROM {table}
+            WHERE {column} IS NOT NULL
+            GROUP BY city_id, day
+        ''', (metric,))
+
+
+def create_rollup_table(cur):
+    '''
+    creates Daily_Rollups (total, count, min and max of each metric per city per obs_date)
+    and the triggers that keep it current; a new rollup table is filled from existing rows
+    '''
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Daily_Rollups'")
+    existed = cur.fetchone() is not None
+    
     cur.execute('''
-        CREATE TABLE IF NOT EXISTS Air_Quality_Data (
-            id INTEGER PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS Daily_Rollups (
             city_id INTEGER,
-            aqi_value REAL,
-            timestamp TEXT,
+            metric TEXT,
+            obs_date TEXT,
+            total REAL,
+            count INTEGER,
+            min_value REAL,
+            max_value REAL,
+            PRIMARY KEY (metric, obs_date, city_id),
             FOREIGN KEY (city_id) REFERENCES Cities(city_id)
         )
     ''')
     
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully!")
+    for provider in PROVIDERS.values():
+        metric, table, column = provider.metric, provider.table, provider.value_column
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table.lower()}_daily_rollup
+            AFTER INSERT ON {table}
+            WHEN NEW.{column} IS NOT NULL
+            BEGIN
+                INSERT INTO Daily_Rollups (city_id, metric, obs_date, total, count, min_value, max_value)
+                VALUES (NEW.city_id, '{metric}', COALESCE(NEW.obs_date, DATE(NEW.timestamp, 'unixepoch', 'localtime')),
+                        NEW.{column}, 1, NEW.{column}, NEW.{column})
+                ON CONFLICT (metric, obs_date, city_id) DO UPDATE SET
+                    total = total + excluded.total,
+                    count = count + 1,
+                    min_value = MIN(min_value, excluded.min_value),
+                    max_value = MAX(max_value, excluded.max_value);
+            END
+        ''')
+    
+    if not existed:
+        fill_rollup_table(cur)
 
 
-def store_weather(city_names, api_key, db_name=DB_NAME):
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    
-    store_count = 0
-    max_stores = 25
-    
-    for city in city_names:
-        if store_count >= max_stores:
-            print(f"Reached limit of {max_stores} cities per run")
-            break
+def rebuild_summary(db_name=DB_NAME):
+    '''
+    rebuilds City_Metric_Summary and Daily_Rollups from scratch (needed after rows
+    are deleted or edited by hand)
+    '''
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
+        create_summary_table(cur)
+        fill_summary_table(cur)
+        create_rollup_table(cur)
+        fill_rollup_table(cur)
+        conn.commit()
         
-        try:
-            params = {
-                'q': city,
-                'appid': api_key,
-                'units': 'imperial'
-            }
-            
-            response = requests.get(OPENWEATHER_BASE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            temperature = data['main']['temp']
-            weather_condition = data['weather'][0]['main']
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            
-            # Get or create city_id
-            cur.execute('SELECT city_id FROM Cities WHERE city_name = ?', (city,))
-            result = cur.fetchone()
-            
-            if result:
-                city_id = result[0]
-            else:
-                cur.execute('SELECT MAX(city_id) FROM Cities')
-                max_id = cur.fetchone()[0]
-                city_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Cities (city_id, city_name) VALUES (?, ?)', 
-                           (city_id, city))
-            
-            # Get or create condition_id
-            cur.execute('SELECT condition_id FROM Weather_Conditions WHERE condition_name = ?', (weather_condition,))
-            result = cur.fetchone()
-            
-            if result:
-                condition_id = result[0]
-            else:
-                cur.execute('SELECT MAX(condition_id) FROM Weather_Conditions')
-                max_id = cur.fetchone()[0]
-                condition_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Weather_Conditions (condition_id, condition_name) VALUES (?, ?)', 
-                           (condition_id, weather_condition))
-            
-            # Check if data for this city on this date already exists
-            cur.execute('''
-                SELECT COUNT(*) FROM Weather_Data 
-                WHERE city_id = ? AND DATE(timestamp) = ?
-            ''', (city_id, current_date))
-            
-            if cur.fetchone()[0] > 0:
-                print(f'Weather data for {city} on {current_date} already exists, skipping...')
-                continue
-            
-            cur.execute('SELECT MAX(id) FROM Weather_Data')
-            max_id = cur.fetchone()[0]
-            weather_id = 1 if max_id is None else max_id + 1
-            
-            cur.execute('''
-                INSERT INTO Weather_Data (id, city_id, temperature, condition_id, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (weather_id, city_id, temperature, condition_id, timestamp))
-            
-            conn.commit()
-            store_count += 1
-            print(f'Stored weather data for {city}: Temp = {temperature}°F, Condition = {weather_condition}')
-            
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"Error for {city}: {e}")
-            continue
-    
-    conn.close()
-    print(f"\nTotal weather records stored this run: {store_count}")
-    
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    cur.execute('SELECT COUNT(*) FROM Weather_Data')
-    total = cur.fetchone()[0]
-    conn.close()
-    print(f"Total weather records in database: {total}")
-    
-    return store_count
+        cur.execute('SELECT COUNT(*) FROM City_Metric_Summary')
+        print(f"Rebuilt summary table: {cur.fetchone()[0]} city/metric rows")
+        cur.execute('SELECT COUNT(*) FROM Daily_Rollups')
+        print(f"Rebuilt daily rollups: {cur.fetchone()[0]} city/metric/day rows")
 
 
-def store_uv(city_names, api_key, city_coordinates, db_name=DB_NAME):
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    
-    stored_count = 0
-    max_stores = 25
-    
-    for city in city_names:
-        if stored_count >= max_stores:
-            print(f"Reached limit of {max_stores} cities per run")
-            break
+def init_database(db_name=DB_NAME):
+    with db.connection(db_name) as conn:
+        cur = conn.cursor()
         
-        try:
-            if city not in city_coordinates:
-                print(f"Coordinates not found for {city}, skipping...")
-                continue
-            
-            lat, lon = city_coordinates[city]
-            
-            headers = {'x-access-token': api_key}
-            params = {'lat': lat, 'lng': lon}
-            
-            response = requests.get(OPENUV_BASE_URL, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            uv_index = data['result']['uv']
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            
-            cur.execute('SELECT city_id FROM Cities WHERE city_name = ?', (city,))
-            result = cur.fetchone()
-            
-            if result:
-                city_id = result[0]
-            else:
-                cur.execute('SELECT MAX(city_id) FROM Cities')
-                max_id = cur.fetchone()[0]
-                city_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Cities (city_id, city_name) VALUES (?, ?)', 
-                           (city_id, city))
-            
-            # Check if data for this city on this date already exists
-            cur.execute('''
-                SELECT COUNT(*) FROM UV_Data 
-                WHERE city_id = ? AND DATE(timestamp) = ?
-            ''', (city_id, current_date))
-            
-            if cur.fetchone()[0] > 0:
-                print(f'UV data for {city} on {current_date} already exists, skipping...')
-                continue
-            
-            cur.execute('SELECT MAX(id) FROM UV_Data')
-            max_id = cur.fetchone()[0]
-            uv_id = 1 if max_id is None else max_id + 1
-            
-            cur.execute('''
-                INSERT INTO UV_Data (id, city_id, uv_index, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (uv_id, city_id, uv_index, timestamp))
-            
-            conn.commit()
-            stored_count += 1
-            print(f'Stored UV data for {city}: UV Index = {uv_index}')
-            
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"Error for {city}: {e}")
-            continue
-    
-    conn.close()
-    print(f"\nTotal UV records stored this run: {stored_count}")
-    
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    cur.execute('SELECT COUNT(*) FROM UV_Data')
-    total = cur.fetchone()[0]
-    conn.close()
-    print(f"Total UV records in database: {total}")
-    
-    return stored_count
+        # every table keys on an INTEGER PRIMARY KEY (an alias for the rowid), so inserts
+        # leave the id out and let SQLite assign it
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS Cities (
+                city_id INTEGER PRIMARY KEY,
+                city_name TEXT UNIQUE
+            )
+        ''')
+        
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS Weather_Conditions (
+                condition_id INTEGER PRIMARY KEY,
+                condition_name TEXT UNIQUE
+            )
+        ''')
+        
+        for provider in PROVIDERS.values():
+            create_measurement_table(cur, provider)
+        
+        for table in MEASUREMENT_TABLES:
+            check_timestamps(cur, table)
+        
+        for table in MEASUREMENT_TABLES:
+            add_obs_date_column(cur, table)
+            migrate_epoch_timestamps(cur, table)
+            create_measurement_indexes(cur, table)
+        
+        create_summary_table(cur)
+        create_rollup_table(cur)
+        
+        conn.commit()
+    print("Database initialized successfully!")
 
 
-def store_air_quality(city_names, api_key, db_name=DB_NAME):
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    
-    store_count = 0
-    max_stores = 25
-    
-    for city in city_names:
-        if store_count >= max_stores:
-            print(f"Reached limit of {max_stores} cities per run")
-            break
-        
-        try:
-            params = {
-                'key': api_key,
-                'q': city,
-                'aqi': 'yes'
-            }
-            
-            response = requests.get(WEATHERAPI_BASE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            aqi_value = data['current']['air_quality']['us-epa-index']
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            
-            cur.execute('SELECT city_id FROM Cities WHERE city_name = ?', (city,))
-            result = cur.fetchone()
-            
-            if result:
-                city_id = result[0]
-            else:
-                cur.execute('SELECT MAX(city_id) FROM Cities')
-                max_id = cur.fetchone()[0]
-                city_id = 1 if max_id is None else max_id + 1
-                cur.execute('INSERT INTO Cities (city_id, city_name) VALUES (?, ?)', 
-                           (city_id, city))
-            
-            # Check if data for this city on this date already exists
-            cur.execute('''
-                SELECT COUNT(*) FROM Air_Quality_Data 
-                WHERE city_id = ? AND DATE(timestamp) = ?
-            ''', (city_id, current_date))
-            
-            if cur.fetchone()[0] > 0:
-                print(f'Air quality data for {city} on {current_date} already exists, skipping...')
-                continue
-            
-            cur.execute('SELECT MAX(id) FROM Air_Quality_Data')
-            max_id = cur.fetchone()[0]
-            aqi_id = 1 if max_id is None else max_id + 1
-            
-            cur.execute('''
-                INSERT INTO Air_Quality_Data (id, city_id, aqi_value, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (aqi_id, city_id, aqi_value, timestamp))
-            
-            conn.commit()
-            store_count += 1
-            print(f'Stored air quality data for {city}: AQI = {aqi_value}')
-            
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"Error for {city}: {e}")
-            continue
-    
-    conn.close()
-    print(f"\nTotal air quality records stored this run: {store_count}")
-    
-    conn = sqlite3.connect(db_name)
-    cur = conn.cursor()
-    cur.execute('SELECT COUNT(*) FROM Air_Quality_Data')
-    total = cur.fetchone()[0]
-    conn.close()
-    print(f"Total air quality records in database: {total}")
-    
-    return store_count
+def store_weather(city_names, api_key, db_name=DB_NAME, batch_size=None, max_stores=25):
+    return collect('openweather', city_names, api_key, db_name, batch_size=batch_size, max_stores=max_stores)
+
+
+def store_uv(city_names, api_key, city_coordinates, db_name=DB_NAME, batch_size=None, max_stores=25):
+    return collect('openuv', city_names, api_key, db_name, city_coordinates, batch_size, max_stores)
+
+
+def store_air_quality(city_names, api_key, db_name=DB_NAME, batch_size=None, max_stores=25):
+    return collect('weatherapi', city_names, api_key, db_name, batch_size=batch_size, max_stores=max_stores)
+
+
+def store_provider(provider, city_names, db_name=DB_NAME, city_coordinates=CITY_COORDS, batch_size=None,
+                   max_stores=25):
+    '''
+    collects one provider's readings with the API key from its key file
+
+    ARGUMENTS:
+        provider: Provider definition
+        city_names: list of city names
+        db_name: SQLite database file
+        city_coordinates: {city: (lat, lng)} for the providers that need coordinates
+        batch_size: most rows per transaction (None = flush on pipeline.FLUSH_INTERVAL only)
+        max_stores: most rows stored per run (None = no limit)
 
+    RETURNS:
+        number of rows stored
+    '''
+    return collect(provider, city_names, API_KEYS[provider.name], db_name, city_coordinates, batch_size, max_stores)
 
-def main():
+
+def main(parallel=False):
     print("="*60)
     print("WEATHER DATA COLLECTION")
     print("="*60)
@@ -392,20 +403,21 @@ def main():
     print("\nInitializing database...")
     init_database()
     
-    print("\n" + "="*50)
-    print("COLLECTING WEATHER DATA (Ella)")
-    print("="*50)
-    store_weather(CITIES, OPENWEATHER_API_KEY)
-    
-    print("\n" + "="*50)
-    print("COLLECTING UV DATA (Emma)")
-    print("="*50)
-    store_uv(CITIES, OPENUV_API_KEY, CITY_COORDS)
-    
-    print("\n" + "="*50)
-    print("COLLECTING AIR QUALITY DATA (Mindy)")
-    print("="*50)
-    store_air_quality(CITIES, WEATHERAPI_KEY)
+    if parallel:
+        print("\n" + "="*50)
+        print("COLLECTING " + ", ".join(provider.label.upper() for provider in PROVIDERS.values())
+              + " DATA IN PARALLEL")
+        print("="*50)
+        with ThreadPoolExecutor(max_workers=len(PROVIDERS)) as executor:
+            jobs = [executor.submit(store_provider, provider, CITIES) for provider in PROVIDERS.values()]
+            for job in jobs:
+                job.result()
+    else:
+        for provider in PROVIDERS.values():
+            print("\n" + "="*50)
+            print(f"COLLECTING {provider.label.upper()} DATA")
+            print("="*50)
+            store_provider(provider, CITIES)
     
     print("\n" + "="*50)
     print("DATA COLLECTION COMPLETE!")
@@ -413,4 +425,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if '--rebuild-summary' in sys.argv:
+        rebuild_summary()
+    elif '--convert-timestamps' in sys.argv:
+        # python store.py --convert-timestamps [database files...] (default: DB_NAME)
+        for db_name in sys.argv[sys.argv.index('--convert-timestamps') + 1:] or [DB_NAME]:
+            convert_timestamps(db_name)
+    else:
+        main(parallel='--parallel' in sys.argv)
+    db.close_pools()
@@ -0,0 +1,189 @@
+import numpy as np
+
+from metrics import METRICS, MetricsFrame, day_start, epoch_expression, window_dates, window_epochs
+
+
+LOAD_BATCH = 100000  # rows read from SQLite at a time
+INITIAL_CAPACITY = 16
+
+
+class SeriesBuffer:
+    '''
+    one city's readings of one metric: int64 epoch seconds and float64 values in
+    two growable NumPy buffers (16 bytes per reading, against 50+ for a tuple of
+    Python objects)
+
+    readings are kept in time order; range() returns views into the buffers, so
+    slicing never copies. A view keeps its contents after later appends: growing
+    or re-sorting moves the data to new buffers and leaves the old ones to the view
+    '''
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity):
+        if capacity <= len(self.times):
+            return
+        capacity = max(capacity, 2 * len(self.times))
+        times = np.empty(capacity, dtype=np.int64)
+        values = np.empty(capacity, dtype=np.float64)
+        times[:self.size] = self.times[:self.size]
+        values[:self.size] = self.values[:self.size]
+        self.times, self.values = times, values
+
+    def append(self, timestamp, value):
+        self.extend([timestamp], [value])
+
+    def extend(self, timestamps, values):
+        '''
+        appends readings; ones older than the newest stored reading are merged into place
+        '''
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        start = self.size
+        self.reserve(start + len(timestamps))
+        self.times[start:start + len(timestamps)] = timestamps
+        self.values[start:start + len(values)] = values
+        self.size += len(timestamps)
+
+        if len(timestamps) and np.any(np.diff(self.times[max(start - 1, 0):self.size]) < 0):
+            # sorted into new buffers, so views handed out earlier keep their contents
+            order = np.argsort(self.times[:self.size], kind='stable')
+            times = np.empty(len(self.times), dtype=np.int64)
+            values = np.empty(len(self.values), dtype=np.float64)
+            times[:self.size] = self.times[:self.size][order]
+            values[:self.size] = self.values[:self.size][order]
+            self.times, self.values = times, values
+
+    def range(self, start=None, end=None):
+        '''
+        ARGUMENTS:
+            start: first epoch second to include (None = from the first reading)
+            end: first epoch second to leave out (None = through the last reading)
+
+        RETURNS:
+            (times, values) NumPy views of the readings in [start, end)
+        '''
+        times = self.times[:self.size]
+        i = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        j = self.size if end is None else int(np.searchsorted(times, end, side='left'))
+        return times[i:j], self.values[i:j]
+
+
+class TimeSeriesStore:
+    '''
+    in-memory readings keyed by metric and city_id, loaded straight from SQLite
+
+    ARGUMENTS:
+        city_names: {city_id: city_name}
+    '''
+
+    def __init__(self, city_names=None):
+        self.city_names = dict(city_names or {})
+        self.series = {metric: {} for metric in METRICS}
+
+    def buffer(self, metric, city_id):
+        city_series = self.series[metric]
+        if city_id not in city_series:
+            city_series[city_id] = SeriesBuffer()
+        return city_series[city_id]
+
+    def append(self, metric, city_id, timestamp, value):
+        self.buffer(metric, city_id).append(timestamp, value)
+
+    def range(self, metric, city_id, start=None, end=None):
+        '''
+        RETURNS:
+            (times, values) views of one city's readings in [start, end) epoch seconds;
+            empty arrays if the city has none
+        '''
+        series = self.series[metric].get(city_id)
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return series.range(start, end)
+
+    def reading_count(self):
+        return sum(len(series) for city_series in self.series.values() for series in city_series.values())
+
+    def to_frame(self, window_days=None, end_date=None):
+        '''
+        per-city count, total and average of every metric, summed with NumPy over
+        views of the buffers
+
+        ARGUMENTS:
+            window_days: only include the last window_days days of readings (None = all history)
+            end_date: last day of the window as 'YYYY-MM-DD' (today by default)
+
+        RETURNS:
+            MetricsFrame, the same one metrics.build_metrics_frame gives for the database
+        '''
+        start = end = None
+        if window_days:
+            start, end = window_epochs(window_dates(window_days, end_date))
+
+        city_ids = sorted(self.city_names)
+        stats = {}
+        for metric in METRICS:
+            counts = []
+            totals = []
+            for city_id in city_ids:
+                _, values = self.range(metric, city_id, start, end)
+                counts.append(len(values))
+                totals.append(float(values.sum()) if len(values) else 0.0)
+
+            stats[metric] = {
+                'count': counts,
+                'total': totals,
+                'avg': [total / count if count else None for count, total in zip(counts, totals)],
+            }
+
+        return MetricsFrame(city_ids, [self.city_names[city_id] for city_id in city_ids], stats, window_days)
+
+
+def load_timeseries(db_conn, since=None):
+    '''
+    loads every reading into a TimeSeriesStore, LOAD_BATCH rows at a time
+
+    ARGUMENTS:
+        db_conn: open database connection
+        since: optional 'YYYY-MM-DD'; only readings from this day on are loaded
+
+    RETURNS:
+        TimeSeriesStore
+    '''
+    cur = db_conn.cursor()
+    cur.execute('SELECT city_id, city_name FROM Cities')
+    store = TimeSeriesStore(cur.fetchall())
+
+    for metric, (table, column) in METRICS.items():
+        sql = f'''
+            SELECT city_id, {epoch_expression(db_conn, table)} AS ts, {column}
+            FROM {table}
+            WHERE {column} IS NOT NULL AND ts IS NOT NULL
+        '''
+        params = []
+        if since:
+            sql += ' AND ts >= ?'
+            params.append(day_start(since))
+        cur.execute(sql + ' ORDER BY city_id, ts', params)
+
+        while True:
+            rows = cur.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            city_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            times = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            values = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+
+            # rows come sorted by city, so each city is one contiguous run of the batch
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(city_ids)) + 1))
+            ends = np.append(starts[1:], len(rows))
+            for start, end in zip(starts, ends):
+                store.buffer(metric, int(city_ids[start])).extend(times[start:end], values[start:end])
+
+    return store